@@ -1,20 +1,34 @@
 """
 監視機能付きスクリーンセーバー
 """
+import sys
+import os # ファイルパス操作用
+# ベンチマーク結果のJSONを標準出力に書き出すため、Pygameの起動メッセージを抑止する
+if len(sys.argv) > 1 and sys.argv[1].lower() == '/bench':
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 import pygame
 import random
-import sys
 import json
 import hashlib # パスワードのハッシュ化用
-import os # ファイルパス操作用
-import colorsys # RGB<->HSV変換用
 import math # 数学関数用
 import shutil # ファイルのバックアップ用
 import threading # スレッド処理用
+import multiprocessing # ボールの物理演算の並列化用
+from multiprocessing import shared_memory # ワーカープロセスとのボール状態の共有用
 import datetime # 日付と時間の操作用
+import time # 高精度な経過時間の計測用
+import collections # LRUキャッシュ用
+import queue # スライドショーの動画のフレームの受け渡し用
+import bisect # スライドショーの索引から画像のパスを求める用
+import concurrent.futures # スライドショーの画像の先読み用
 import logging # ロギング用
 import logging.handlers # ロギングのハンドラ用
 import atexit # 終了時のクリーンアップ用
+import argparse # ベンチマークのコマンドライン引数の解析用
+import platform # ベンチマーク結果に実行環境を記録する用
+import tempfile # ベンチマーク用のサンプル画像の保存先
+import tracemalloc # ベンチマークのピークメモリ計測用
+import numpy as np # ボール群などの一括計算用
 import cv2
 
 # GUI表示のために早期にインポート
@@ -22,8 +36,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog, colorchooser # 色選択ダイアログ用
 
 from PIL import Image
-import pystray # システムトレイアイコン用
+try:
+    import pystray # システムトレイアイコン用
+except Exception: # ディスプレイのない環境 (ベンチマーク実行時など) ではバックエンドの初期化に失敗する
+    pystray = None
 if sys.platform == "win32":
+    resource = None
     try:
         import psutil # Windowsのアイドル時間取得用
     except ImportError:
@@ -36,6 +54,14 @@ if sys.platform == "win32":
     except ImportError:
         win32api = None
         win32crypt = None
+else:
+    psutil = None
+    win32api = None
+    win32crypt = None
+    try:
+        import resource # ベンチマークのピークメモリ計測用 (Unix系のみ)
+    except ImportError:
+        resource = None
 
 # カメラ監視のためにOpenCVをインポート
 try:
@@ -63,21 +89,63 @@ DEFAULT_BALL_COUNT = 10
 BLACK = (0, 0, 0)
 MIN_BALL_RADIUS = 10
 MAX_BALL_RADIUS = 50
+# 衝突判定のグリッドのセルサイズ。半径は壁衝突のたびに変わるが、MAX_BALL_RADIUSを超えないため
+# 最大直径をセルの一辺にすれば、衝突し得る2つのボールは必ず隣接するセルに入る
+COLLISION_CELL_SIZE = MAX_BALL_RADIUS * 2
+# 1ステップの衝突処理の中で、めり込み解消によってこの距離以上動いたボールは近傍セルの組を集め直す
+COLLISION_REQUERY_DISTANCE = COLLISION_CELL_SIZE / 2
+# めり込み解消で新たに重なった組を拾い直すのは、最初のこの数のラウンドで動いたボールまで。以降のラウンドでは残りの組だけを処理する
+# (ボールが画面に詰まっていると、めり込み解消が連鎖していつまでも終わらないため。増やすほど正確になるが、密集時に遅くなる)
+COLLISION_RECHECK_ROUNDS = 1
 # スクリーンセーバーに切り替わるまでの無操作時間 (ミリ秒)
 DEFAULT_MAX_VELOCITY = 3  # ボールの最大速度
 IDLE_TIMEOUT = 5000  # 5秒
 DEFAULT_SLIDESHOW_FOLDER = ""  # 空文字列は無効なフォルダとして扱う
 DEFAULT_SLIDESHOW_INTERVAL = 5  # 秒
+DEFAULT_SLIDESHOW_CACHE_MB = 1024 # 縮小済み画像のディスクキャッシュの上限 (MB)。0ならキャッシュしない
+DEFAULT_SLIDESHOW_RECURSIVE = False # 画像フォルダのサブフォルダ内の画像も表示するか
+DEFAULT_SLIDESHOW_KEN_BURNS = False # 画像をパン＆ズーム (ケン・バーンズ効果) で表示するか
+DEFAULT_SLIDESHOW_MEMORY_CACHE_MB = 256 # 表示済みの画像をメモリに残しておく上限 (MB)。0なら残さない (4Kでは1枚約33MB)
+SUPPORTED_IMAGE_FORMATS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+SUPPORTED_IMAGE_HEADER_FORMATS = {"PNG", "JPEG", "MPO", "BMP", "GIF"} # ヘッダーから判別した形式 (PillowのImage.format)。MPOはデジカメのJPEG
+SUPPORTED_VIDEO_FORMATS = (".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm", ".wmv")
+SLIDESHOW_FORMATS = SUPPORTED_IMAGE_FORMATS + SUPPORTED_VIDEO_FORMATS # スライドショーに表示するファイルの拡張子
 
 FADE_DURATION = 1000 # スライドショーのクロスフェード時間（ミリ秒）
+SLIDESHOW_PREFETCH_COUNT = 2 # 先読みしておく次以降の画像の枚数
+SLIDESHOW_PREFETCH_WORKERS = 2 # 画像の読み込みと縮小を行うスレッドの数
+CLIP_FRAME_QUEUE_SIZE = 4 # 動画・アニメーションGIFのデコード済みフレームを溜めておく枚数 (動画の長さによらず、メモリ使用量はこの枚数分)
+CLIP_DEFAULT_FPS = 30 # フレームレートを取得できない動画で仮定するフレームレート
+CLIP_READY_TIMEOUT = 5 # 動画の最初のフレームのデコードを待つ上限 (秒)
+KEN_BURNS_LEVEL_ZOOMS = (1.05, 1.10, 1.15) # パン＆ズーム用に先読み時に作っておく拡大率 (ミップレベル)。最後の値が最大の拡大率
+KEN_BURNS_MAX_ZOOM = KEN_BURNS_LEVEL_ZOOMS[-1]
+
+# --- 物理演算のタイムステップ ---
+# 速度(ピクセル/フレーム)や寿命(フレーム数)は、このフレームレートで動いた場合の1フレームを単位とする
+REFERENCE_FPS = 60
+DEFAULT_PHYSICS_SUBSTEPS = 2 # 基準フレームあたりの物理演算の分割数 (2なら120Hzで計算)
+MAX_FRAME_TIME = 0.25 # 1回の描画で進めるシミュレーション時間の上限 (秒)。極端に遅いフレームで処理が追いつかなくなるのを防ぐ
+
+# --- ボールの物理演算の並列化 ---
+DEFAULT_BALL_WORKERS = 0 # 物理演算を行うワーカープロセスの数 (0なら並列化せずメインプロセスで計算)
+# 各ワーカーが担当する横帯の外側に含めて計算する範囲 (ピクセル)。帯の境界をまたいで衝突し得るボールを含めるため、最大直径をとる
+BALL_STRIP_MARGIN = MAX_BALL_RADIUS * 2
+BALL_WORKER_TIMEOUT = 5.0 # ワーカーの応答を待つ最大時間 (秒)。超えた場合はメインプロセスでの計算に戻す
 
 DEFAULT_LINE_COUNT = 15  # ラインアートの線の数
 DEFAULT_LINE_SPEED = 3
+DEFAULT_LINE_TRAIL_LENGTH = 0 # 残像が消えるまでに記録する位置の数 (0なら残像なし)
+MAX_LINE_TRAIL_LENGTH = 500
+LINE_TRAIL_INTERVAL = 4 # 残像の位置を記録する間隔 (基準フレーム)
 
 # --- マトリックスモードのデフォルト値 ---
 DEFAULT_MATRIX_FONT_SIZE = 18
 DEFAULT_MATRIX_SPEED = 3
 DEFAULT_MATRIX_FONT = "consolas" # 等幅フォントの例。見つからない場合はOSのデフォルトが使われる
+MATRIX_MUTATION_RATE = 0.2 # 基準フレームあたりに各筋の文字が1つ入れ替わる確率
+MATRIX_GLYPHS = "".join(chr(i) for i in range(33, 127)) # ASCIIの表示可能文字（スペースを除く）'!'(33) から '~'(126) まで
+MATRIX_GRADIENT_LEVELS = 32 # 文字のグラデーション (緑の明るさ) を何段階で描き分けるか
+MATRIX_HEAD_COLOR = (200, 255, 200) # 先頭の文字の色 (白っぽく明るい)
 
 # --- 時刻表示のデフォルト値 ---
 DEFAULT_CLOCK_ENABLED = True
@@ -85,11 +153,60 @@ DEFAULT_CLOCK_POSITION = "bottomright" # topleft, topright, bottomleft, bottomri
 DEFAULT_CLOCK_COLOR = (200, 200, 200) # 明るいグレー
 DEFAULT_CLOCK_FONT_SIZE = 24
 
+# --- 花火パーティクルの定数 ---
+PARTICLE_POOL_CAPACITY = 8192 # 同時に存在できるパーティクルの最大数 (超えた分は古いものから上書き)
+PARTICLE_GRAVITY = 0.1 # 重力加速度
+
+# --- 円スプライトキャッシュの定数 ---
+SPRITE_COLOR_STEP = 64 # スプライトの色を量子化する幅 (各成分4段階、全64色のパレット)
+# 描画済みの円スプライトを保持する最大数。
+# ボール (半径40種類) とパーティクル (半径1〜4) のキーがパレットの全色分入る大きさにして、
+# ボールが多くてもLRUが使う前に追い出してしまわないようにする
+SPRITE_CACHE_SIZE = 4096
+
+# --- ダーティ矩形描画の定数 ---
+DEFAULT_DIRTY_RECT_ENABLED = False
+DIRTY_RECT_MAX_COUNT = 2000 # 1フレームの更新矩形がこの数を超えたら全画面更新に切り替える
+DIRTY_RECT_FULL_UPDATE_RATIO = 0.5 # 更新矩形の合計面積が画面のこの割合を超えたら全画面更新に切り替える
+
+# --- 残像効果 (アフターグロー) ---
+DEFAULT_AFTERGLOW_ENABLED = False
+AFTERGLOW_DECAY = (215, 215, 215) # 前フレームの色に毎フレーム掛ける倍率 (255で1倍)。小さいほど残像が早く消える
+AFTERGLOW_FLOOR = (2, 2, 2) # 倍率を掛けた後に引く値。掛け算の切り上げで暗い色がいつまでも残るのを防ぐ
+AFTERGLOW_TILE_HEIGHT = 64 # 暗くするときに敷き詰める単色タイルの高さ (ピクセル)
+
+# --- フレーム計測の定数 ---
+DEFAULT_FRAME_PROFILER_ENABLED = False
+PROFILER_HUD_KEY = pygame.K_F3 # 計測結果の画面表示を切り替えるキー (計測が有効な場合のみ、セーバーは解除されない)
+PROFILER_HUD_INTERVAL = 0.5 # 画面表示を更新する間隔 (秒)
+PROFILER_LOG_INTERVAL = 10.0 # 計測結果をログに出力する間隔 (秒)
+PROFILER_HUD_FONT_SIZE = 18
+PROFILER_HUD_COLOR = (255, 255, 0)
+
+# --- 描画負荷の自動調整 ---
+DEFAULT_QUALITY_GOVERNOR_ENABLED = True
+QUALITY_TARGET_FRAME_TIME = 1.0 / 60 # 1フレームの処理 (待機時間を除く) にかけてよい時間 (秒)
+QUALITY_EVAL_INTERVAL = 1.0 # 品質を見直す間隔 (秒)
+QUALITY_RESTORE_RATIO = 0.7 # 処理時間が目標のこの割合を下回ったら、品質を1段階戻す候補とする
+QUALITY_RESTORE_DELAY = 3 # 余裕のある状態がこの回数続いたら品質を戻す (頻繁な上げ下げを防ぐ)
+# 品質レベルごとの (火花の生成数の倍率, パーティクル上限の倍率, 文字の入れ替え頻度の倍率, 動かすオブジェクト数の倍率)
+# 負荷が高いほど下のレベルに移り、火花の数 → パーティクル上限 → 文字の入れ替え → オブジェクト数 の順に削る
+QUALITY_LEVELS = (
+    (1.0, 1.0, 1.0, 1.0),
+    (0.5, 1.0, 1.0, 1.0),
+    (0.25, 0.5, 1.0, 1.0),
+    (0.25, 0.25, 0.5, 1.0),
+    (0.25, 0.25, 0.25, 1.0),
+    (0.25, 0.25, 0.25, 0.75),
+    (0.25, 0.25, 0.25, 0.5),
+)
+
 # --- プレビュー用定数 ---
 PREVIEW_WIDTH = 350
 PREVIEW_HEIGHT = 200
 PREVIEW_BALL_COUNT = 5  # プレビュー用のボールの数
 PREVIEW_LINE_COUNT = 3
+PREVIEW_PARTICLE_CAPACITY = 512
 
 # --- パスワードUIのデフォルト値 ---
 DEFAULT_PASSWORD_UI_POSITION = "center" # center, top, bottom
@@ -134,11 +251,23 @@ class CfgKey:
     MAX_VELOCITY = "max_velocity"
     SLIDESHOW_FOLDER = "slideshow_folder"
     SLIDESHOW_INTERVAL = "slideshow_interval"
+    SLIDESHOW_CACHE_MB = "slideshow_cache_mb"
+    SLIDESHOW_RECURSIVE = "slideshow_recursive"
+    SLIDESHOW_KEN_BURNS = "slideshow_ken_burns"
+    SLIDESHOW_MEMORY_CACHE_MB = "slideshow_memory_cache_mb"
     MATRIX_FONT_SIZE = "matrix_font_size"
     MATRIX_SPEED = "matrix_speed"
     MATRIX_FONT = "matrix_font"
     LINE_COUNT = "line_count"
     LINE_SPEED = "line_speed"
+    LINE_TRAIL_LENGTH = "line_trail_length"
+    PHYSICS_SUBSTEPS = "physics_substeps"
+    # --- パフォーマンス設定 ---
+    DIRTY_RECT_ENABLED = "dirty_rect_enabled"
+    AFTERGLOW_ENABLED = "afterglow_enabled"
+    BALL_WORKERS = "ball_workers"
+    FRAME_PROFILER_ENABLED = "frame_profiler_enabled"
+    QUALITY_GOVERNOR_ENABLED = "quality_governor_enabled"
     PASSWORD_ENABLED = "password_enabled"
     PASSWORD_HASH = "password_hash"
     PASSWORD_UI_POSITION = "password_ui_position"
@@ -165,6 +294,10 @@ class CfgKey:
 
 SETTINGS_FILE = os.path.join(BASE_PATH, "settings.json")
 SETTINGS_BACKUP_FILE = SETTINGS_FILE + ".bak"
+FONT_CACHE_FILE = os.path.join(BASE_PATH, "font_cache.json") # フォント名から解決したフォントファイルのパスの保存先
+SCALED_IMAGE_CACHE_DIR = os.path.join(BASE_PATH, "image_cache") # 画面サイズに縮小済みのスライドショー画像の保存先
+SLIDESHOW_INDEX_FILE = os.path.join(BASE_PATH, "slideshow_index.json") # スライドショーの画像フォルダの索引の保存先
+SLIDESHOW_QUARANTINE_FILE = os.path.join(BASE_PATH, "slideshow_quarantine.json") # 読み込めなかったスライドショー画像の一覧の保存先
 
 def setup_logging():
     """ロギングを設定し、ファイルとコンソールの両方に出力する"""
@@ -354,6 +487,9 @@ def exit_action(icon, item):
 def setup_tray_icon():
     """システムトレイにアイコンをセットアップし、別スレッドで実行する"""
     global tray_icon, tray_icons
+    if not pystray:
+        logging.warning("pystrayを利用できないため、システムトレイアイコンは表示されません。")
+        return
 
     # 状態ごとのアイコン画像を読み込む
     def load_icon(filename, fallback_color):
@@ -388,217 +524,2304 @@ def update_tray_status(is_active):
         tray_icon.icon = tray_icons[new_status]
         tray_icon.title = f"Python Screensaver ({'実行中' if is_active else '待機中'})"
 
-def get_image_files(folder):
-    """指定されたフォルダからサポートされている画像ファイルのリストを取得する"""
-    supported_formats = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+def fit_size(width, height, screen_width, screen_height):
+    """アスペクト比を維持して画面に収まる大きさ"""
+    scale = min(screen_width / width, screen_height / height)
+    return int(width * scale), int(height * scale)
+
+def decode_jpeg_draft(path, screen_width, screen_height):
+    """
+    JPEGを、画面に収めたときの大きさ以上を保つ最小の 1/2, 1/4, 1/8 の大きさで直接デコードする
+    (PillowのImage.draft。libjpegのDCTスケーリングにより、全画素のデコードと縮小を省ける)。
+    (サーフェス, 元画像の大きさ) を返す。1/2以下に縮小できない場合は、サーフェスの代わりにNoneを返す
+    (Pillowからpygameへの受け渡しのコピーの分、pygame.image.load で読み込むより遅くなるため)。
+    """
+    with Image.open(path) as img:
+        full_size = img.size
+        target_width, target_height = fit_size(*full_size, screen_width, screen_height)
+        if full_size[0] < target_width * 2 or full_size[1] < target_height * 2:
+            return None, full_size
+        img.draft("RGB", (target_width, target_height))
+        if img.mode != "RGB":
+            img = img.convert("RGB") # CMYKやグレースケールのJPEG
+        return pygame.image.frombytes(img.tobytes(), img.size, "RGB"), full_size
+
+def probe_image_header(path):
+    """
+    画像のヘッダーだけを読み、形式と大きさを確かめる (画素データはデコードしない)。
+    壊れたファイルや対応していない形式なら理由を表す文字列を、問題なければNoneを返す。
+    """
     try:
-        if not folder or not os.path.isdir(str(folder)):
-            return []
-        return [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(supported_formats)]
-    except (PermissionError, OSError) as e:
-        logging.error(f"画像フォルダのスキャン中にエラーが発生しました: {folder}, error: {e}")
-        return []
+        with Image.open(path) as img:
+            if img.format not in SUPPORTED_IMAGE_HEADER_FORMATS:
+                return f"対応していない画像形式です ({img.format})"
+            width, height = img.size
+    except Image.DecompressionBombError:
+        return None # 画素数が多すぎてPillowが開かないだけで、pygameでは読み込める
+    except (OSError, ValueError, SyntaxError) as e: # 判別できない形式は PIL.UnidentifiedImageError (OSError)
+        return str(e)
+    if width <= 0 or height <= 0:
+        return f"画像の大きさが不正です ({width}x{height})"
+    return None
 
 def load_and_scale_image(path, screen_width, screen_height):
-    """画像を読み込み、アスペクト比を維持して画面に合うようにスケーリングする"""
+    """
+    画像を読み込み、アスペクト比を維持して画面に合うようにスケーリングする。
+    JPEGは画面サイズ以上を保つ範囲で縮小しながらデコードし (decode_jpeg_draft)、それ以外の形式は元の大きさで読み込む。
+    """
     try:
-        img = pygame.image.load(path)
-        img_rect = img.get_rect()
-
-        # アスペクト比を維持してスケーリング係数を計算
-        scale_w = screen_width / img_rect.width
-        scale_h = screen_height / img_rect.height
-        scale = min(scale_w, scale_h)
-
-        new_width = int(img_rect.width * scale)
-        new_height = int(img_rect.height * scale)
-
-        # 高品質なスケーリング
-        return pygame.transform.smoothscale(img, (new_width, new_height))
+        img = None
+        if path.lower().endswith((".jpg", ".jpeg")):
+            try:
+                img, full_size = decode_jpeg_draft(path, screen_width, screen_height)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                logging.warning(f"JPEGの縮小デコードに失敗したため、通常の読み込みを行います: {path}, error: {e}")
+        if img is None:
+            img = pygame.image.load(path)
+            full_size = img.get_size()
+
+        # 高品質なスケーリング (縮小デコードした場合も、元画像の大きさから表示サイズを決める)
+        return pygame.transform.smoothscale(img, fit_size(*full_size, screen_width, screen_height))
     except pygame.error as e:
         logging.error(f"画像の読み込みまたはスケーリングに失敗しました: {path}, error: {e}")
         return None
 
 
-class Line:
-    """ラインアートの線分を管理するクラス"""
-    def __init__(self, max_speed, screen_width, screen_height):
-        """線の初期化"""
-        self.screen_width = screen_width
-        self.screen_height = screen_height
+class SurfaceLRUCache:
+    """
+    読み込み済みのスライドショー画像 (画面サイズのキャンバス) を、合計バイト数の上限までメモリに残しておくLRUキャッシュ。
+    上限を超えたら最も長く使われていないものから破棄する。一周して同じ画像に戻ったときに読み込み直さずに済む。
+    先読みスレッドと描画ループの両方から使うため、ロックで保護する。
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.surfaces = collections.OrderedDict() # キー → サーフェス
+        self.resident_bytes = 0 # 保持しているサーフェスの合計バイト数
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def surface_bytes(surface):
+        """サーフェス (パン＆ズーム用の (拡大率, サーフェス) のリストなら、その全て) の画素データのバイト数"""
+        if isinstance(surface, list):
+            return sum(level.get_pitch() * level.get_height() for _, level in surface)
+        return surface.get_pitch() * surface.get_height()
+
+    def get(self, key):
+        """キーに対応するサーフェスを返す。なければNoneを返す"""
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+    def put(self, key, surface):
+        """サーフェスを追加し、上限を超えた分を最も長く使われていないものから破棄する"""
+        size = self.surface_bytes(surface)
+        if size > self.budget_bytes:
+            return
+        with self.lock:
+            previous = self.surfaces.pop(key, None)
+            if previous is not None:
+                self.resident_bytes -= self.surface_bytes(previous)
+            self.surfaces[key] = surface
+            self.resident_bytes += size
+            while self.resident_bytes > self.budget_bytes:
+                _, evicted = self.surfaces.popitem(last=False)
+                self.resident_bytes -= self.surface_bytes(evicted)
+
+    @property
+    def hit_rate(self):
+        """これまでのキャッシュヒット率 (0.0〜1.0)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def log_stats(self, label):
+        """キャッシュのサイズ調整用に、ヒット率と使用メモリ量をログに出力する"""
+        logging.info(f"{label}: ヒット率 {self.hit_rate:.1%} (ヒット {self.hits} / ミス {self.misses}), "
+                     f"保持数 {len(self.surfaces)}, 使用量 {self.resident_bytes / (1024 * 1024):.1f}/{self.budget_bytes / (1024 * 1024):.0f} MB")
+
+
+class ScaledImageCache:
+    """
+    画面サイズに縮小済みのスライドショー画像をディスクに保存しておくキャッシュ。
+    キーは (元画像のパス, 更新日時, ファイルサイズ, 表示サイズ) で、元画像が変更されれば別のキーになる。
+    読み込みの速い非圧縮のBMP形式で保存し、合計サイズが上限を超えたら最後に使われた日時の古いものから削除する
+    (使われた日時にはファイルの更新日時を使い、キャッシュから読み込むたびに更新する)。
+    スライドショーの先読みスレッドから同時に呼ばれるため、合計サイズの管理はロックで保護する。
+    """
+    def __init__(self, folder, quota_bytes):
+        self.folder = folder
+        self.quota_bytes = quota_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None # キャッシュの合計サイズ (初めて保存するときにフォルダを走査して求める)
+
+    def _entry_path(self, path, width, height):
+        """元画像と表示サイズに対応するキャッシュファイルのパス"""
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}x{height}"
+        return os.path.join(self.folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".bmp")
+
+    def _entries(self):
+        """キャッシュファイルの (最後に使われた日時, サイズ, パス) のリスト (書き込み途中の一時ファイルは含めない)"""
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith(".bmp") and not entry.name.endswith(".tmp.bmp") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def load(self, path, width, height):
+        """縮小済みの画像がキャッシュにあれば読み込んで返す。なければNoneを返す"""
+        try:
+            entry_path = self._entry_path(path, width, height)
+            if not os.path.exists(entry_path):
+                return None
+            surface = pygame.image.load(entry_path)
+            os.utime(entry_path) # 最後に使われた日時を更新
+            return surface
+        except (OSError, pygame.error) as e:
+            logging.warning(f"画像キャッシュの読み込みに失敗しました: {path}, error: {e}")
+            return None
+
+    def store(self, path, width, height, surface):
+        """縮小済みの画像をキャッシュに保存し、上限を超えた分を古いものから削除する"""
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        if size > self.quota_bytes:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            entry_path = self._entry_path(path, width, height)
+            # 書き込み途中のファイルを読まれないよう、一時ファイルに保存してから置き換える (拡張子で保存形式が決まる)
+            temp_path = f"{entry_path[:-4]}.{threading.get_ident()}.tmp.bmp"
+            pygame.image.save(surface, temp_path)
+            with self.lock:
+                # 同じキャッシュファイルを置き換える場合は、古いファイルの分を合計サイズから引く
+                try:
+                    old_size = os.path.getsize(entry_path)
+                except FileNotFoundError:
+                    old_size = 0
+                os.replace(temp_path, entry_path)
+                if self.total_bytes is None:
+                    self.total_bytes = sum(entry[1] for entry in self._entries())
+                else:
+                    self.total_bytes += os.path.getsize(entry_path) - old_size
+                if self.total_bytes > self.quota_bytes:
+                    self._evict()
+        except (OSError, pygame.error) as e:
+            logging.warning(f"画像キャッシュの保存に失敗しました: {path}, error: {e}")
+
+    def _evict(self):
+        """合計サイズが上限以下になるまで、最後に使われた日時の古いキャッシュファイルから削除する"""
+        entries = sorted(self._entries())
+        self.total_bytes = sum(entry[1] for entry in entries)
+        for _, size, entry_path in entries:
+            if self.total_bytes <= self.quota_bytes:
+                break
+            try:
+                os.remove(entry_path)
+                self.total_bytes -= size
+            except OSError as e:
+                logging.warning(f"画像キャッシュの削除に失敗しました: {entry_path}, error: {e}")
+        logging.info(f"画像キャッシュを上限 {self.quota_bytes // (1024 * 1024)} MB 以下に整理しました。")
 
-        # 2つの端点が画面内に収まるように初期位置を設定
-        self.x1 = random.randrange(0, self.screen_width)
-        self.y1 = random.randrange(0, self.screen_height)
-        self.x2 = random.randrange(0, self.screen_width)
-        self.y2 = random.randrange(0, self.screen_height)
 
-        self.color = (random.randrange(50, 256), random.randrange(50, 256), random.randrange(50, 256))
-        self.width = random.randint(1, 3)
+class ImageQuarantine:
+    """
+    読み込みに失敗したスライドショー画像の除外リスト。パスと更新日時を SLIDESHOW_QUARANTINE_FILE に保存し、
+    壊れたファイルを一周ごとにデコードし直さないようにする。ファイルが更新されれば (更新日時が変われば) 読み込み直す。
+    索引の作成時にヘッダーの確認で除外したファイルもここに入れる。
+    contains は描画ループからも呼ばれるため、リストの変更や保存はしない。更新・削除されたファイルをリストから消して保存するのは、
+    追加 (先読みスレッドや索引の作成) と flush のときに行う。先読みスレッドから追加されるため、ロックで保護する。
+    """
+    def __init__(self, quarantine_file=SLIDESHOW_QUARANTINE_FILE):
+        self.quarantine_file = quarantine_file
+        self.entries = None # 画像の絶対パス → {"mtime": 更新日時 (ns), "error": 失敗の理由} (初めて使うときに読み込む)
+        self.dirty = False # 保存していない変更があるか
+        self.lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """保存済みの除外リストを読み込む (ロックを取得した状態で呼ぶ)"""
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.quarantine_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"スライドショーの除外リストの読み込みに失敗しました: {e}")
+
+    def _save(self):
+        """除外リストを保存する (ロックを取得した状態で呼ぶ)"""
+        self.dirty = False
+        try:
+            with open(self.quarantine_file, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+        except OSError as e:
+            logging.warning(f"スライドショーの除外リストの保存に失敗しました: {e}")
+
+    def _prune(self):
+        """更新・削除されたファイルをリストから消す (ロックを取得した状態で呼ぶ)"""
+        for key, entry in list(self.entries.items()):
+            try:
+                if os.stat(key).st_mtime_ns == entry.get("mtime"):
+                    continue
+                logging.info(f"更新された画像を除外リストから外しました: {key}")
+            except OSError:
+                logging.info(f"削除された画像を除外リストから消しました: {key}")
+            del self.entries[key]
+            self.dirty = True
+
+    def add(self, path, reason, save=True):
+        """読み込めなかった画像を除外リストに追加する。saveがFalseなら、flush を呼ぶまで保存しない"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return # ファイルが削除された場合は、次の索引の更新で一覧から外れる
+        with self.lock:
+            self._ensure_loaded()
+            self.entries[os.path.abspath(path)] = {"mtime": mtime, "error": reason}
+            self.dirty = True
+            if save:
+                self._prune()
+                self._save()
+        logging.warning(f"読み込めない画像をスライドショーから除外しました: {path}, error: {reason}")
+
+    def flush(self):
+        """更新・削除されたファイルをリストから消し、add(save=False) で追加した分と合わせて保存する"""
+        with self.lock:
+            self._ensure_loaded()
+            self._prune()
+            if self.dirty:
+                self._save()
+
+    def contains(self, path):
+        """
+        画像が除外リストにあり、その後更新されていないか (削除されたファイルは読み込めないため、Trueを返す)。
+        リストの変更や保存はしない。
+        """
+        with self.lock:
+            self._ensure_loaded()
+            entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        try:
+            return os.stat(path).st_mtime_ns == entry.get("mtime")
+        except OSError:
+            return True
 
-        # 0を除いた速度の選択肢を生成
-        max_s = int(max_speed)
-        velocity_choices = list(range(-max_s, 0)) + list(range(1, max_s + 1))
-        if not velocity_choices: velocity_choices = [-1, 1]
+    def names_by_folder(self):
+        """除外リストの画像を、フォルダの絶対パス → ファイル名の集合 にまとめる"""
+        with self.lock:
+            self._ensure_loaded()
+            folders = collections.defaultdict(set)
+            for path in self.entries:
+                folders[os.path.dirname(path)].add(os.path.basename(path))
+        return folders
 
-        # 各端点の速度
-        self.dx1 = random.choice(velocity_choices)
-        self.dy1 = random.choice(velocity_choices)
-        self.dx2 = random.choice(velocity_choices)
-        self.dy2 = random.choice(velocity_choices)
-
-    def move(self):
-        """線の両端を移動させ、壁で反射させる"""
-        # 端点1の移動
-        self.x1 += self.dx1
-        self.y1 += self.dy1
-        if self.x1 <= 0 or self.x1 >= self.screen_width: self.dx1 *= -1
-        if self.y1 <= 0 or self.y1 >= self.screen_height: self.dy1 *= -1
-
-        # 端点2の移動
-        self.x2 += self.dx2
-        self.y2 += self.dy2
-        if self.x2 <= 0 or self.x2 >= self.screen_width: self.dx2 *= -1
-        if self.y2 <= 0 or self.y2 >= self.screen_height: self.dy2 *= -1
 
-    def draw(self, screen):
-        """線を画面に描画する"""
-        pygame.draw.line(screen, self.color, (self.x1, self.y1), (self.x2, self.y2), self.width)
+class ImageFolderIndex:
+    """
+    スライドショーの画像フォルダの索引。フォルダごとの更新日時と画像ファイル名・サブフォルダ名を SLIDESHOW_INDEX_FILE に保存しておき、
+    次回以降は更新日時の変わったフォルダだけを os.scandir で読み直す
+    (フォルダの更新日時は、直下のファイルの追加・削除・名前の変更で変わる)。
+    変化がなければフォルダ1つにつき stat 1回で済むため、大量の画像があっても起動時間はほとんど変わらない。
+    読み直すフォルダの新しいファイルはヘッダーを確かめ (probe_image_header)、壊れたファイルや対応していない形式は
+    ファイルの更新日時とともに除外リスト (ImageQuarantine) に入れる。除外リストにある画像は一覧から外し、
+    その後更新されていればヘッダーを確かめ直す (コピー中のファイルなど、ファイルの中身の変化ではフォルダの更新日時は変わらないため)。
+    画像ファイルのパスは一覧を作らず、番号を指定されたときにフォルダごとの画像数の累計から求める。
+    """
+    def __init__(self, folder, recursive=False, index_file=SLIDESHOW_INDEX_FILE, quarantine=None):
+        self.folder = folder
+        self.recursive = recursive
+        self.index_file = index_file
+        self.quarantine = quarantine if quarantine is not None else ImageQuarantine()
+        self.dirs = None # フォルダの相対パス → {"mtime": 更新日時 (ns), "files": [...], "subdirs": [...]}
+        self.folders = [] # 画像のあるフォルダの (パス, 画像ファイル名のリスト)
+        self.offsets = [] # self.folders の各フォルダより前にある画像の数
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """index番目の画像ファイルのパス"""
+        folder = bisect.bisect_right(self.offsets, index) - 1
+        path, names = self.folders[folder]
+        return os.path.join(path, names[index - self.offsets[folder]])
+
+    def _load(self):
+        """保存済みの索引を読み込む (別のフォルダや設定の索引なら使わない)"""
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (isinstance(data, dict) and data.get("folder") == os.path.abspath(self.folder)
+                    and data.get("recursive") == self.recursive and data.get("formats") == list(SLIDESHOW_FORMATS)
+                    and isinstance(data.get("dirs"), dict)):
+                return data["dirs"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"スライドショーの索引の読み込みに失敗しました。フォルダを走査し直します: {e}")
+        return {}
+
+    def _save(self):
+        data = {"folder": os.path.abspath(self.folder), "recursive": self.recursive, "formats": list(SLIDESHOW_FORMATS), "dirs": self.dirs}
+        try:
+            with open(self.index_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            logging.warning(f"スライドショーの索引の保存に失敗しました: {e}")
+
+    def _scan(self, path, mtime, previous=None):
+        """
+        フォルダ直下の画像・動画ファイル名とサブフォルダ名を読み取る。
+        前回の索引 (previous) になかった画像ファイルはヘッダーを確かめ、読み込めないものは除外リストに入れる
+        (索引自体には残し、除外リストの更新日時で確かめ直すかを決める。動画は再生に失敗したときに除外リストに入れる)。
+        """
+        known = set(previous["files"]) if previous else set()
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False): # シンボリックリンクをたどらず、循環を避ける
+                            subdirs.append(entry.name)
+                        elif entry.name.lower().endswith(SLIDESHOW_FORMATS) and entry.is_file():
+                            if entry.name not in known:
+                                self._probe(entry.path)
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logging.error(f"画像フォルダのスキャン中にエラーが発生しました: {path}, error: {e}")
+            return None
+        return {"mtime": mtime, "files": files, "subdirs": subdirs}
+
+    def _probe(self, path):
+        """画像ファイルのヘッダーを確かめ、読み込めなければ除外リストに入れる。読み込めるか (動画は常にTrue) を返す"""
+        reason = probe_image_header(path) if path.lower().endswith(SUPPORTED_IMAGE_FORMATS) else None
+        if reason:
+            self.quarantine.add(path, reason, save=False)
+            return False
+        return True
+
+    def _admit(self, path):
+        """除外リストにある画像を一覧に入れるか。その後更新されていれば、ヘッダーを確かめ直す"""
+        return not self.quarantine.contains(path) and self._probe(path)
+
+    def refresh(self):
+        """更新日時の変わったフォルダだけを読み直して索引を更新する"""
+        self.folders = []
+        self.offsets = []
+        self.count = 0
+        if not self.folder or not os.path.isdir(str(self.folder)):
+            return
+        previous = self.dirs if self.dirs is not None else self._load()
+        dirs = {}
+        scanned = [] # 走査したフォルダの (パス, 索引のエントリ)
+        rescanned = 0
+        pending = [""] # 走査するフォルダの相対パス
+        while pending:
+            relative = pending.pop()
+            path = os.path.join(self.folder, relative) if relative else self.folder
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError as e:
+                logging.warning(f"画像フォルダの情報を取得できません: {path}, error: {e}")
+                continue
+            entry = previous.get(relative)
+            if entry is None or entry.get("mtime") != mtime:
+                entry = self._scan(path, mtime, entry)
+                rescanned += 1
+                if entry is None:
+                    continue
+            dirs[relative] = entry
+            scanned.append((path, entry))
+            if self.recursive:
+                pending.extend(os.path.join(relative, name) if relative else name for name in entry["subdirs"])
+
+        # 除外リストにある画像を一覧から外す (走査中に除外リストに入れた画像も含めるため、走査の後に行う)
+        quarantined = self.quarantine.names_by_folder()
+        for path, entry in scanned:
+            names = entry["files"]
+            excluded = quarantined.get(os.path.abspath(path)) if quarantined else None
+            if excluded:
+                names = [name for name in names if name not in excluded or self._admit(os.path.join(path, name))]
+            if names:
+                self.folders.append((path, names))
+                self.offsets.append(self.count)
+                self.count += len(names)
+        # 更新・削除されたファイルを除外リストから消して保存する
+        self.quarantine.flush()
+
+        self.dirs = dirs
+        if rescanned or dirs.keys() != previous.keys():
+            self._save()
+        logging.info(f"スライドショーの索引を更新しました: {len(dirs)} フォルダ (うち読み直し {rescanned})、画像 {self.count} 枚")
+
+
+class ShuffledOrder:
+    """
+    0〜count-1 の番号をランダムな順序で返す。
+    画像のパスの一覧ではなく番号の並べ替えだけをint32の配列で持つため、画像が大量にあっても1枚あたり4バイトで済む。
+    """
+    def __init__(self, count, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        self.permutation = rng.permutation(count).astype(np.int32)
 
+    def __len__(self):
+        return len(self.permutation)
 
-class MatrixStream:
-    """マトリックス風の文字の雨を管理するクラス"""
-    def __init__(self, x, font_size, speed, screen_height, font_name):
-        self.x = x
-        self.y = random.randint(-500, 0) # 初期Y座標は画面外の上部にランダム配置
-        self.font_size = font_size 
-        self.speed = speed
+    def __getitem__(self, position):
+        return int(self.permutation[position % len(self.permutation)])
+
+
+class ClipPlayer:
+    """
+    スライドショーの動画・アニメーションGIFを再生するクラス。
+    OpenCVでのデコードと画面サイズへの縮小はバックグラウンドのスレッドで行い、CLIP_FRAME_QUEUE_SIZE 枚までのキューに溜める
+    (キューが一杯ならデコードを待つため、動画の長さによらずメモリ使用量は一定)。
+    再生位置はデコードの速さではなく、update に渡されるスクリーンセーバーの時刻で決める。
+    デコードが間に合わない場合は、表示時刻を過ぎたフレームを色変換と縮小をせずに読み飛ばす。
+    最後まで再生したら先頭に戻って繰り返す。
+    """
+    def __init__(self, path, screen_width, screen_height):
+        self.path = path
+        self.screen_width = screen_width
         self.screen_height = screen_height
-        # 文字列の長さを画面の高さに基づいて動的に決定
-        self.length = random.randint(screen_height // font_size, (screen_height // font_size) * 2)
-        # ASCIIの表示可能文字（スペースを除く）
-        self.characters = [chr(i) for i in range(33, 127)] # '!'(33) から '~'(126) まで
-        self.symbols = [random.choice(self.characters) for _ in range(self.length)] # 初期文字列
+        # 画像と同じく、画面全体を覆う不透明なキャンバスにフレームを描く (クロスフェードをそのまま使えるようにする)
+        self.canvas = pygame.Surface((screen_width, screen_height))
+        if pygame.display.get_surface():
+            self.canvas = self.canvas.convert()
+        self.canvas.fill(BLACK)
+        self.frames = queue.Queue(maxsize=CLIP_FRAME_QUEUE_SIZE) # (表示時刻 (ms), サーフェス)
+        self.pending = None # キューから取り出した、まだ表示時刻になっていないフレーム
+        self.start_time = None # 再生を始めた時刻 (初めて update が呼ばれた時刻)
+        self.elapsed_ms = None # 再生開始からの経過時間 (デコードスレッドが読み飛ばしの判断に使う)
+        self.duration_ms = None # 1回分の再生時間 (最後まで読み込んだときに分かる)
+        self.failed = False # 1フレームもデコードできなかったか
+        self.ready = threading.Event() # 最初のフレームがデコードされたか、デコードに失敗した
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._decode, name="ClipDecoder", daemon=True)
+        self.thread.start()
+
+    def wait_ready(self, timeout):
+        """最初のフレームがデコードされるまで待つ。デコードに失敗した場合はFalseを返す"""
+        self.ready.wait(timeout)
+        return not self.failed
+
+    def close(self):
+        """デコードスレッドを止める (終了は待たない)"""
+        self.stop_event.set()
+
+    def _put(self, item):
+        """フレームをキューに入れる。キューが一杯なら空くまで待つ。止められた場合はFalseを返す"""
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        """動画を先頭からデコードし、画面サイズに縮小したフレームをキューに入れる (デコードスレッドで実行)"""
+        capture = cv2.VideoCapture(self.path)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            frame_ms = 1000 / (fps if 1 <= fps <= 240 else CLIP_DEFAULT_FPS)
+            pts = 0.0 # 次のフレームの表示時刻 (繰り返し再生しても増え続ける)
+            size = None
+            decoded_in_loop = 0 # 今回の繰り返しでデコードしたフレーム数
+            while not self.stop_event.is_set():
+                # 次のフレームの表示時刻も既に過ぎていれば、このフレームは読み飛ばす
+                behind = self.elapsed_ms is not None and pts + frame_ms <= self.elapsed_ms
+                ok = capture.grab()
+                if ok and not behind:
+                    ok, frame = capture.retrieve()
+                if not ok:
+                    if decoded_in_loop == 0:
+                        self.failed = pts == 0
+                        break
+                    if self.duration_ms is None:
+                        self.duration_ms = pts
+                    # 先頭に戻る (シークできない形式もあるため開き直す)
+                    capture.release()
+                    capture = cv2.VideoCapture(self.path)
+                    decoded_in_loop = 0
+                    continue
+                decoded_in_loop += 1
+                if not behind:
+                    if size is None:
+                        size = fit_size(frame.shape[1], frame.shape[0], self.screen_width, self.screen_height)
+                    shrink = size[0] < frame.shape[1]
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    surface = pygame.image.frombuffer(frame, size, "RGB")
+                    if pygame.display.get_surface():
+                        surface = surface.convert()
+                    if not self._put((pts, surface)):
+                        break
+                    self.ready.set()
+                pts += frame_ms
+        except (cv2.error, pygame.error) as e:
+            logging.error(f"動画のデコード中にエラーが発生しました: {self.path}, error: {e}")
+            self.failed = self.failed or not self.ready.is_set()
+        finally:
+            capture.release()
+            if self.duration_ms is None:
+                self.duration_ms = pts # 途中で止まった場合は、そこまでを1回分とする
+            self.ready.set()
+
+    def update(self, current_time):
+        """current_time の時点で表示するフレームをキャンバスに描いて、キャンバスを返す"""
+        if self.start_time is None:
+            self.start_time = current_time
+        self.elapsed_ms = current_time - self.start_time
+        frame = None
+        while True:
+            if self.pending is None:
+                try:
+                    self.pending = self.frames.get_nowait()
+                except queue.Empty:
+                    break
+            if self.pending[0] > self.elapsed_ms:
+                break
+            frame = self.pending[1]
+            self.pending = None
+        if frame is not None:
+            self.canvas.blit(frame, frame.get_rect(center=(self.screen_width / 2, self.screen_height / 2)))
+        return self.canvas
+
+    def played_through(self, current_time):
+        """最後まで1回以上再生したか (デコードに失敗した場合もTrue)"""
+        if self.failed:
+            return True
+        if self.start_time is None or self.duration_ms is None:
+            return False
+        return current_time - self.start_time >= self.duration_ms
+
+
+class KenBurnsImage:
+    """
+    スライドショーの画像をパン＆ズーム (ケン・バーンズ効果) で表示するクラス。
+    先読み時に KEN_BURNS_LEVEL_ZOOMS の各拡大率のキャンバス (ミップレベル) を作っておき、毎フレームは、
+    その時点の拡大率以上で最も近いレベルから表示範囲を切り出して (subsurface)、画面サイズに transform.scale するだけにする
+    (smoothscaleを毎フレーム行うと4Kでは間に合わない。縮小率は1〜レベルの間隔程度のため、最近傍補間でも粗さは目立たない)。
+    拡大/縮小の向きと、動かし始めと終わりの表示位置は、表示するたびにランダムに選ぶ。
+    """
+    def __init__(self, levels, screen_width, screen_height, duration_ms, rng=random):
+        self.levels = levels # (拡大率, キャンバス) のリスト。拡大率の小さい順
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.duration_ms = duration_ms # 動かし始めてから止まるまでの時間
+        zooms = (1.0, KEN_BURNS_MAX_ZOOM)
+        self.start_zoom, self.end_zoom = zooms if rng.random() < 0.5 else zooms[::-1]
+        # 表示範囲の位置は、動かせる範囲の中での割合 (0〜1) で持つ
+        self.start_pan = (rng.random(), rng.random())
+        self.end_pan = (rng.random(), rng.random())
+        self.start_time = None # 表示を始めた時刻 (初めて update が呼ばれた時刻)
+        self.frame = None # フェード中に半透明で描くための画面サイズのサーフェス (必要になったときに作る)
+
+    def update(self, current_time, target=None):
+        """current_time の時点の表示範囲を target (省略時は self.frame) に描いて返す"""
+        if self.start_time is None:
+            self.start_time = current_time
+        progress = min(1.0, max(0.0, (current_time - self.start_time) / self.duration_ms))
+        progress = progress * progress * (3 - 2 * progress) # 動き始めと終わりを滑らかにする
+        zoom = self.start_zoom + (self.end_zoom - self.start_zoom) * progress
+        level_zoom, level = next((item for item in self.levels if item[0] >= zoom), self.levels[-1])
+
+        # レベルの中で、画面に表示する範囲 (拡大率が高いほど狭い)
+        level_width, level_height = level.get_size()
+        width = min(level_width, round(self.screen_width * level_zoom / zoom))
+        height = min(level_height, round(self.screen_height * level_zoom / zoom))
+        pan_x = self.start_pan[0] + (self.end_pan[0] - self.start_pan[0]) * progress
+        pan_y = self.start_pan[1] + (self.end_pan[1] - self.start_pan[1]) * progress
+        x = round((level_width - width) * pan_x)
+        y = round((level_height - height) * pan_y)
+
+        if target is None:
+            if self.frame is None:
+                self.frame = pygame.Surface((self.screen_width, self.screen_height))
+                if pygame.display.get_surface():
+                    self.frame = self.frame.convert()
+            target = self.frame
+        pygame.transform.scale(level.subsurface((x, y, width, height)), (self.screen_width, self.screen_height), target)
+        return target
+
+
+class Slideshow:
+    """
+    スライドショーの画像の切り替えとクロスフェードを管理するクラス。
+    次に表示する SLIDESHOW_PREFETCH_COUNT 枚の画像は、スレッドプールでシャッフル順に先読み (読み込みと縮小) しておき、
+    描画ループは読み込みを待たずに、準備のできた画像から切り替える (まだの場合は現在の画像の表示を続ける)。
+    動画とアニメーションGIFは ClipPlayer で再生し、切り替え間隔が過ぎていても最後まで1回再生してから次に切り替える。
+    ken_burnsがTrueなら、静止画は KenBurnsImage でパン＆ズームしながら表示する。
+    """
+    def __init__(self, folder, interval_ms, screen_width, screen_height, cache=None, recursive=False, memory_cache=None, ken_burns=False):
+        self.folder = folder
+        self.interval_ms = interval_ms
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.ken_burns = ken_burns
+        self.cache = cache # 縮小済み画像のディスクキャッシュ (ScaledImageCache、使わない場合はNone)
+        self.memory_cache = memory_cache # 読み込み済みの画像のメモリキャッシュ (SurfaceLRUCache、使わない場合はNone)
+        self.quarantine = ImageQuarantine() # 読み込めなかった画像の除外リスト
+        self.index = ImageFolderIndex(folder, recursive, quarantine=self.quarantine)
+        self.order = ShuffledOrder(0) # 表示順 (何枚目に表示するか → 画像ファイルの一覧の番号)
+        self.current_image_index = 0
+        self.last_image_change_time = 0
+        self.current_image_surface = None # 現在表示中の画像 (キャンバス、動画なら ClipPlayer、パン＆ズームなら KenBurnsImage)
+        self.next_image_surface = None    # フェードインしてくる次の画像 (同上)
+        self.spare_frame = None # パン＆ズームのフェードイン用のサーフェスの使い回し (画面サイズの確保は4Kでは遅いため)
+        self.is_fading = False # フェード中かどうか
+        self.fade_start_time = 0
+        self.executor = None
+        self.prefetch = collections.deque() # 先読み中の (画像の番号, Future)。表示する順に並ぶ
+        self.next_prefetch_index = 0 # 次に先読みを始める画像の番号
+
+    def start(self, current_time):
+        """画像ファイルの一覧を読み込み直し、最初の画像がすぐに表示されるように状態を初期化する"""
+        self._cancel_prefetch()
+        self._close_slide(self.current_image_surface)
+        self._close_slide(self.next_image_surface)
+        self.index.refresh()
+        self.order = ShuffledOrder(len(self.index))
+        if self.order:
+            self.current_image_index = -1
+            self.current_image_surface = None
+            self.next_image_surface = None
+            self.is_fading = False
+            self.last_image_change_time = current_time - self.interval_ms - 1
+            self.next_prefetch_index = 0
+            self._schedule_prefetch()
+        else:
+            logging.warning(f"スライドショーフォルダ \"{self.folder}\" に画像が見つかりません。")
+
+    def close(self):
+        """先読みと動画の再生を中止し、スレッドプールを終了する"""
+        self._cancel_prefetch()
+        self._close_slide(self.current_image_surface)
+        self._close_slide(self.next_image_surface)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def _cancel_prefetch(self):
+        """まだ始まっていない先読みを取り消し、先読み中の画像を破棄する"""
+        for _, future in self.prefetch:
+            if not future.cancel():
+                future.add_done_callback(self._discard_prefetched)
+        self.prefetch.clear()
+
+    @staticmethod
+    def _discard_prefetched(future):
+        """取り消せなかった先読みの結果が動画なら、デコードスレッドを止める"""
+        if not future.cancelled() and future.exception() is None:
+            Slideshow._close_slide(future.result())
+
+    @staticmethod
+    def _close_slide(slide):
+        """表示しなくなった画像が動画なら、デコードスレッドを止める"""
+        if isinstance(slide, ClipPlayer):
+            slide.close()
+
+    @staticmethod
+    def _canvas(slide, current_time):
+        """画像のキャンバス。動画やパン＆ズームなら current_time の時点のフレームを描いたキャンバス"""
+        return slide.update(current_time) if isinstance(slide, (ClipPlayer, KenBurnsImage)) else slide
+
+    def _make_slide(self, canvas):
+        """読み込んだ画像 (パン＆ズームならミップレベルのリスト) から、表示する画像を作る"""
+        if self.ken_burns:
+            # フェードイン・表示・フェードアウトの間、動かし続ける
+            return KenBurnsImage(canvas, self.screen_width, self.screen_height, self.interval_ms + 2 * FADE_DURATION)
+        return canvas
+
+    def _schedule_prefetch(self):
+        """
+        先読み中の画像が SLIDESHOW_PREFETCH_COUNT 枚になるまで、次の画像の読み込みを開始する。
+        起動後に除外リストに入った画像は読み込まずに飛ばす。
+        """
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=SLIDESHOW_PREFETCH_WORKERS, thread_name_prefix="SlideshowPrefetch")
+        skipped = 0
+        while len(self.prefetch) < SLIDESHOW_PREFETCH_COUNT:
+            index = self.next_prefetch_index
+            path = self._image_path(index)
+            if self.quarantine.contains(path):
+                self.next_prefetch_index = (index + 1) % len(self.order)
+                skipped += 1
+                if skipped >= len(self.order):
+                    logging.warning("スライドショーに表示できる画像がありません。")
+                    break
+                continue
+            canvas = self.memory_cache.get(path) if self.memory_cache else None
+            if canvas:
+                # メモリキャッシュにあれば、スレッドを使わずに完了済みとして扱う
+                future = concurrent.futures.Future()
+                future.set_result(self._make_slide(canvas))
+            else:
+                future = self.executor.submit(self._load_image, path)
+            self.prefetch.append((index, future))
+            self.next_prefetch_index = (index + 1) % len(self.order)
+
+    def _image_path(self, index):
+        """index枚目に表示する画像ファイルのパス"""
+        return self.index[self.order[index]]
+
+    def _load_image(self, path):
+        """
+        画像を画面サイズに縮小して読み込み、画面と同じ大きさのキャンバスにして返す (先読みスレッドで実行)。
+        ディスクキャッシュにあればそれを使う。動画とアニメーションGIFは、再生を始めた ClipPlayer を返す。
+        パン＆ズームでは、最大の拡大率の大きさで読み込んでミップレベルを作り、KenBurnsImage を返す。
+        """
+        if self._is_clip(path):
+            return self._open_clip(path)
+        width, height = self.screen_width, self.screen_height
+        if self.ken_burns:
+            width, height = round(width * KEN_BURNS_MAX_ZOOM), round(height * KEN_BURNS_MAX_ZOOM)
+        surface = self.cache.load(path, width, height) if self.cache else None
+        if not surface:
+            surface = load_and_scale_image(path, width, height)
+            if surface and self.cache:
+                self.cache.store(path, width, height, surface)
+        if not surface:
+            self.quarantine.add(path, "画像の読み込みまたはスケーリングに失敗しました")
+            return None
+        canvas = self._make_mip_levels(surface) if self.ken_burns else self._make_canvas(surface)
+        if self.memory_cache:
+            self.memory_cache.put(path, canvas)
+        return self._make_slide(canvas)
+
+    def _make_mip_levels(self, image):
+        """パン＆ズーム用に、KEN_BURNS_LEVEL_ZOOMS の各拡大率で画面を覆うキャンバスの (拡大率, キャンバス) のリストを作る"""
+        levels = []
+        for zoom in KEN_BURNS_LEVEL_ZOOMS:
+            size = (round(self.screen_width * zoom), round(self.screen_height * zoom))
+            scaled_size = fit_size(*image.get_size(), *size)
+            scaled = image if scaled_size == image.get_size() else pygame.transform.smoothscale(image, scaled_size)
+            levels.append((zoom, self._make_canvas(scaled, size)))
+        return levels
+
+    @staticmethod
+    def _is_clip(path):
+        """動画、またはアニメーションGIFか"""
+        lower = path.lower()
+        if lower.endswith(SUPPORTED_VIDEO_FORMATS):
+            return True
+        if lower.endswith(".gif"):
+            try:
+                with Image.open(path) as img:
+                    return getattr(img, "is_animated", False)
+            except (OSError, ValueError):
+                return False # 静止画として読み込み、失敗すればそちらで除外リストに入れる
+        return False
+
+    def _open_clip(self, path):
+        """動画の再生を始め、最初のフレームがデコードされるまで待つ (先読みスレッドで実行)"""
+        player = ClipPlayer(path, self.screen_width, self.screen_height)
+        if not player.wait_ready(CLIP_READY_TIMEOUT):
+            player.close()
+            self.quarantine.add(path, "動画のデコードに失敗しました")
+            return None
+        return player
+
+    def _make_canvas(self, image, size=None):
+        """
+        画像を中央に置いた、画面 (またはsize) と同じ大きさ・画素形式の不透明なキャンバスを作る。
+        画素形式の変換 (と透過画像の黒背景への合成) を読み込み時に1回だけ済ませ、毎フレームのblitを単純なコピーにする。
+        余白も含めて画面全体を覆うため、クロスフェードは次の画像を1回アルファ合成するだけで描ける。
+        """
+        width, height = size or (self.screen_width, self.screen_height)
+        canvas = pygame.Surface((width, height))
+        if pygame.display.get_surface():
+            canvas = canvas.convert()
+        canvas.fill(BLACK)
+        canvas.blit(image, image.get_rect(center=(width / 2, height / 2)))
+        return canvas
+
+    def wait_prefetch(self):
+        """先読み中の画像の読み込みが全て終わるまで待つ (ベンチマーク用。描画ループからは呼ばない)"""
+        concurrent.futures.wait([future for _, future in self.prefetch])
+
+    def _take_prefetched(self):
+        """
+        先読みの終わった次の画像を (画像の番号, サーフェス) で返す。まだ読み込み中ならNoneを返す (待たない)。
+        読み込みに失敗した画像は飛ばす (サーフェスがNone)。
+        """
+        if not self.prefetch or not self.prefetch[0][1].done():
+            return None
+        index, future = self.prefetch.popleft()
+        self._schedule_prefetch()
+        try:
+            return index, future.result()
+        except Exception as e: # pygame.error 以外の想定外の例外 (メモリ不足など) でもスライドショーを止めない
+            logging.error(f"画像の先読みに失敗しました: {self._image_path(index)}, error: {e}")
+            return index, None
+
+    def draw(self, screen, current_time):
+        """現在の画像 (フェード中は前後の画像) を描画し、描画した領域のリストを返す"""
+        rects = []
+        if not self.order:
+            return rects
+
+        # --- フェード開始トリガー ---
+        # (動画は切り替え間隔が過ぎていても、最後まで1回再生してから切り替える)
+        if (not self.is_fading and current_time - self.last_image_change_time > self.interval_ms
+                and not (isinstance(self.current_image_surface, ClipPlayer) and not self.current_image_surface.played_through(current_time))):
+            # 先読みの終わった次の画像を受け取る (読み込み中なら、終わるまで現在の画像を表示し続ける)
+            prefetched = self._take_prefetched()
+            if prefetched:
+                next_image_index, self.next_image_surface = prefetched
+                if self.next_image_surface is not None and self.next_image_surface is self.current_image_surface:
+                    # 画像が1枚だけの場合など、メモリキャッシュから同じ画像が返ってきたら切り替えない
+                    # (同じサーフェスを半透明と不透明で同時に描くことはできないため)
+                    self.next_image_surface = None
+                    self.current_image_index = next_image_index
+                    self.last_image_change_time = current_time
+                elif self.next_image_surface:
+                    self.is_fading = True
+                    self.fade_start_time = current_time
+                    if isinstance(self.next_image_surface, KenBurnsImage):
+                        self.next_image_surface.frame, self.spare_frame = self.spare_frame, None
+                else:
+                    # 読み込みに失敗した画像は飛ばし、タイマーはそのままにして次のフレームで次の先読み画像に切り替える
+                    # (失敗した画像は除外リストに入るため、次の周からは読み込まない)
+                    self.current_image_index = next_image_index
+
+        # --- フェード処理 ---
+        fade_progress = (current_time - self.fade_start_time) / FADE_DURATION
+        if self.is_fading and fade_progress >= 1.0:
+            # フェード完了時の状態更新 (このフレームから次の画像を不透明で描く。
+            # アルファ値255のままアルファ合成すると、SDLが遅い経路で処理するため)
+            self.is_fading = False
+            self._close_slide(self.current_image_surface)
+            self._canvas(self.next_image_surface, current_time).set_alpha(None)
+            if isinstance(self.next_image_surface, KenBurnsImage):
+                # 以降は画面に直接描くため、次のフェードインに回す
+                self.spare_frame, self.next_image_surface.frame = self.next_image_surface.frame, None
+            self.current_image_surface = self.next_image_surface
+            self.next_image_surface = None
+            self.current_image_index = (self.current_image_index + 1) % len(self.order)
+            self.last_image_change_time = current_time
+
+        # --- 描画 ---
+        # 現在の画像は常に不透明のまま描く (キャンバスは画面と同じ画素形式のため、単純なコピーになる)
+        if isinstance(self.current_image_surface, KenBurnsImage) and screen.get_size() == (self.screen_width, self.screen_height):
+            # パン＆ズームの画像は、一旦別のサーフェスに描かずに画面へ直接拡大縮小する
+            self.current_image_surface.update(current_time, screen)
+            rects.append(screen.get_rect())
+        elif self.current_image_surface:
+            rects.append(screen.blit(self._canvas(self.current_image_surface, current_time), (0, 0)))
+        if self.is_fading:
+            # フェードインする次の画像を、現在の画像の上に1回だけアルファ合成する
+            # (現在の画像 x (1 - a) + 次の画像 x a となり、両方をそれぞれ半透明で描くのと同じ結果になる)
+            next_canvas = self._canvas(self.next_image_surface, current_time)
+            next_canvas.set_alpha(int(255 * fade_progress))
+            rects.append(screen.blit(next_canvas, (0, 0)))
+        return rects
+
+
+class LineArtSystem:
+    """
+    ラインアートの全ての線分をNumPy配列でまとめて管理するクラス。
+    両端点の座標と速度を (線の数, 4) の配列で持ち、移動と壁での反射を全ての線まとめて計算する。
+    trail_lengthが1以上なら、LINE_TRAIL_INTERVAL (基準フレーム) ごとの位置を残像として描く。
+    残像は画面と同じ大きさのサーフェスに描き足していき、位置を記録するたびにサーフェス全体を少しずつ暗くして、
+    最も明るい色 (255) でも trail_length 回の記録で黒 (カラーキーで透明) になるようにする。
+    古い残像を黒で上書きして消すと、交差する新しい残像まで欠けてしまうため、上書きはしない。
+    毎フレームの描画量は残像の長さによらない。
+    """
+    def __init__(self, count, max_speed, screen_width, screen_height, trail_length=0):
+        self.rng = np.random.default_rng()
+        self.bounds = np.array([screen_width, screen_height, screen_width, screen_height], dtype=np.float64)
+        # 2つの端点が画面内に収まるように初期位置を設定 (x1, y1, x2, y2)
+        self.pos = np.floor(self.rng.random((count, 4)) * self.bounds)
+        self.prev = self.pos.copy() # 描画時の補間用に、直前のステップの位置を保持
+
+        # 0を除いた速度の選択肢から、各端点の速度を選ぶ
+        max_s = int(max_speed)
+        velocity_choices = list(range(-max_s, 0)) + list(range(1, max_s + 1))
+        if not velocity_choices: velocity_choices = [-1, 1]
+        self.velocity = self.rng.choice(velocity_choices, size=(count, 4)).astype(np.float64)
+
+        self.color = self.rng.integers(50, 256, size=(count, 3))
+        self.width = self.rng.integers(1, 4, size=count)
+        self._colors = [tuple(color) for color in self.color.tolist()]
+        self._widths = self.width.tolist()
+
+        self.trail_length = trail_length
+        self.trail_surface = None
+        self._reset_trail(count)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def _reset_trail(self, count):
+        """残像を消し、先頭count本の線の残像を記録し直す"""
+        self.trail_count = count
+        self.trail_elapsed = 0.0
+        self.trail_fade = 0.0 # 残像のサーフェスをまだ暗くしていない端数
+        self.trail_pending = [] # 残像のサーフェスに未反映の位置
+        self.trail_cleared = True
+
+    def move(self, step=1.0, count=None):
+        """
+        先頭count本 (省略時は全て) の線の両端をstep (基準フレーム単位) だけ移動させ、壁で反射させる。
+        """
+        count = len(self) if count is None else count
+        pos = self.pos[:count]
+        velocity = self.velocity[:count]
+        self.prev[:count] = pos
+        pos += velocity * step
+        velocity[(pos <= 0) | (pos >= self.bounds)] *= -1
+
+        if self.trail_length == 0:
+            return
+        if count != self.trail_count:
+            # 動かす線の数が変わった場合は、残像を最初から記録し直す
+            self._reset_trail(count)
+        self.trail_elapsed += step
+        if self.trail_elapsed < LINE_TRAIL_INTERVAL:
+            return
+        self.trail_elapsed -= LINE_TRAIL_INTERVAL
+        self.trail_pending.append(pos.copy())
+
+    def _draw_segments(self, surface, positions, colors):
+        """位置の配列の各線分を描く"""
+        draw_line = pygame.draw.line
+        return [draw_line(surface, color, (x1, y1), (x2, y2), width)
+                for color, (x1, y1, x2, y2), width in zip(colors, positions.tolist(), self._widths)]
+
+    def _update_trail(self, screen):
+        """記録された位置を残像のサーフェスに反映する (全体を暗くしてから、新しい位置を描く)"""
+        if self.trail_surface is None or self.trail_surface.get_size() != screen.get_size():
+            self.trail_surface = pygame.Surface(screen.get_size())
+            self.trail_surface.set_colorkey(BLACK)
+            self.trail_cleared = True
+        if self.trail_cleared:
+            self.trail_surface.fill(BLACK)
+            self.trail_cleared = False
+        for newest in self.trail_pending:
+            # 1回の記録で暗くする量は 255 / trail_length。1未満の端数は次の記録に持ち越す
+            self.trail_fade += 255 / self.trail_length
+            amount = int(self.trail_fade)
+            if amount:
+                self.trail_fade -= amount
+                self.trail_surface.fill((amount, amount, amount), special_flags=pygame.BLEND_RGB_SUB)
+            self._draw_segments(self.trail_surface, newest, self._colors)
+        self.trail_pending.clear()
+
+    def draw(self, screen, alpha=1.0, count=None, return_rects=False):
+        """
+        先頭count本 (省略時は全て) の線と残像を描画する。alphaは直前のステップから現在位置までの補間係数。
+        return_rectsがTrueなら、描画した領域のリストを返す (ダーティ矩形描画用)
+        """
+        count = len(self) if count is None else count
+        rects = []
+        if self.trail_length:
+            self._update_trail(screen)
+            rects.append(screen.blit(self.trail_surface, (0, 0)))
+        prev = self.prev[:count]
+        rects.extend(self._draw_segments(screen, prev + (self.pos[:count] - prev) * alpha, self._colors))
+        return rects if return_rects else None
+
+
+class FontRegistry:
+    """
+    プロセス全体で共有するフォントのキャッシュ。
+    (フォント名, サイズ) ごとに pygame.font.Font を1つだけ作り、マトリックスの文字、時刻表示、パスワードUIで共有する。
+    フォント名から解決したフォントファイルのパスは FONT_CACHE_FILE に保存し、
+    次回以降の起動ではシステムフォントの検索 (フォントの多い環境では数百ミリ秒かかる) を省く。
+    見つからなかったフォント名は保存せず、次回の起動時に検索し直す (後からインストールされたフォントも使えるようにする)。
+    """
+    _fonts = {}
+    _paths = None # フォント名 → フォントファイルのパス (見つからない場合はNone。Noneは保存しない)
+
+    @classmethod
+    def _load_paths(cls):
+        """保存済みのフォントファイルのパスを読み込む"""
+        cls._paths = {}
+        try:
+            with open(FONT_CACHE_FILE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if isinstance(cached, dict):
+                # 削除されたフォントファイルのパス (と以前の形式で保存された見つからなかったフォント名) は捨てて、次に使うときに検索し直す
+                cls._paths = {name: path for name, path in cached.items() if isinstance(path, str) and os.path.isfile(path)}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"フォントキャッシュの読み込みに失敗しました。フォントを検索し直します: {e}")
+
+    @classmethod
+    def _save_paths(cls):
         try:
-            # 指定されたフォントを読み込む
-            self.font = pygame.font.SysFont(font_name, self.font_size)
-        except pygame.error:
-            # フォントが見つからない場合はデフォルトフォントを使用
-            self.font = pygame.font.Font(None, self.font_size)
-
-    def update(self):
-        """文字の雨の位置を更新する"""
-        self.y += self.speed
+            with open(FONT_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump({name: path for name, path in cls._paths.items() if path}, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.warning(f"フォントキャッシュの保存に失敗しました: {e}")
+
+    @classmethod
+    def resolve(cls, name):
+        """フォント名 (カンマ区切りで複数指定可) に対応するフォントファイルのパスを返す。見つからなければNone"""
+        if cls._paths is None:
+            cls._load_paths()
+        key = name.lower()
+        if key not in cls._paths:
+            cls._paths[key] = pygame.font.match_font(name)
+            logging.info(f"フォント \"{name}\" を検索しました: {cls._paths[key] or '見つかりません (デフォルトフォントを使用)'}")
+            if cls._paths[key]:
+                cls._save_paths()
+        return cls._paths[key]
+
+    @classmethod
+    def get(cls, name, size):
+        """フォント名とサイズに対応するフォントを返す。フォントが見つからない場合や読み込めない場合はデフォルトフォントを使う"""
+        key = (name.lower() if name else None, size)
+        font = cls._fonts.get(key)
+        if font is None:
+            path = cls.resolve(name) if name else None
+            try:
+                font = pygame.font.Font(path, size)
+                font.size(" ") # 壊れたフォントファイルは、作成時ではなく使うときにエラーになることがあるため
+            except (pygame.error, OSError) as e:
+                logging.warning(f"フォント \"{name}\" を読み込めません。デフォルトフォントを使用します: {path}, error: {e}")
+                font = pygame.font.Font(None, size)
+            cls._fonts[key] = font
+        return font
+
+    @classmethod
+    def clear(cls):
+        """
+        作成済みのフォントを破棄する (pygame.quit() の後はフォントが使えなくなるため)。
+        古いフォントから作ったマトリックスの文字のアトラスも合わせて破棄する
+        """
+        cls._fonts.clear()
+        GlyphAtlas.clear()
+
+
+class GlyphAtlas:
+    """
+    マトリックスの文字を、グラデーションの段階ごとにあらかじめ1枚のサーフェスへ描画しておくアトラス。
+    行がグラデーションの段階 (最後の行は先頭の文字用の色)、列が MATRIX_GLYPHS の文字に対応し、
+    描画はアトラス上の領域を指定したblitだけで済む。フォントとサイズの組ごとに1つだけ作る。
+    マトリックスモードの背景は常に黒なので、文字は黒背景でアンチエイリアス描画し、黒をカラーキーで抜く
+    (アルファ合成より高速で、黒背景の上では見た目も同じ)。
+    """
+    _atlases = {}
+
+    @classmethod
+    def get(cls, font_name, font_size):
+        """フォント名とサイズに対応するアトラスを返す。まだなければ作成する"""
+        key = (font_name, font_size)
+        atlas = cls._atlases.get(key)
+        if atlas is None:
+            atlas = cls._atlases[key] = cls(FontRegistry.get(font_name, font_size))
+        return atlas
+
+    @classmethod
+    def clear(cls):
+        """作成済みのアトラスを破棄する (FontRegistry.clear から呼ばれる)"""
+        cls._atlases.clear()
+
+    def __init__(self, font):
+        self.cell_width = cell_width = max(font.size(glyph)[0] for glyph in MATRIX_GLYPHS)
+        self.cell_height = cell_height = font.get_linesize()
+        self.surface = pygame.Surface((cell_width * len(MATRIX_GLYPHS), cell_height * (MATRIX_GRADIENT_LEVELS + 1)))
+        self.surface.fill(BLACK)
+        self.areas = [] # areas[段階][文字の番号] = アトラス上の領域
+        for level in range(MATRIX_GRADIENT_LEVELS + 1):
+            color = MATRIX_HEAD_COLOR if level == MATRIX_GRADIENT_LEVELS else (0, self.level_green(level), 70)
+            row = []
+            for index, glyph in enumerate(MATRIX_GLYPHS):
+                glyph_surface = font.render(glyph, True, color, BLACK)
+                position = (index * cell_width, level * cell_height)
+                self.surface.blit(glyph_surface, position)
+                row.append(pygame.Rect(position, glyph_surface.get_size()))
+            self.areas.append(row)
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+        self.surface.set_colorkey(BLACK)
+
+    @staticmethod
+    def level_green(level):
+        """グラデーションの段階に対応する緑の明るさ (0〜255)"""
+        return round(level * 255 / (MATRIX_GRADIENT_LEVELS - 1))
+
+    @staticmethod
+    def level_for(green):
+        """緑の明るさ (0〜255) に最も近いグラデーションの段階"""
+        return round(max(0, green) * (MATRIX_GRADIENT_LEVELS - 1) / 255)
+
+
+class MatrixRain:
+    """
+    マトリックス風の文字の雨 (画面全体の全ての筋) を管理するクラス。
+    各筋のY座標・長さ・速度と文字番号の行列をNumPy配列で持ち、位置の更新や文字の入れ替えを全ての筋まとめて計算する。
+    描画は筋ごとの縦長のサーフェス (列ストリップ) に一度だけ文字を描いておき、毎フレームはその見えている部分をblitする。
+    文字が入れ替わったときは、その行だけをアトラスから描き直す。
+    """
+    def __init__(self, screen_width, screen_height, font_size, speed, font_name):
+        self.font_size = font_size
+        self.screen_height = screen_height
+        self.rng = np.random.default_rng()
+        count = screen_width // font_size
+        self.x = np.arange(count) * font_size
+        self.y = self.rng.integers(-500, 1, size=count).astype(np.float64) # 初期Y座標は画面外の上部にランダム配置
+        self.speed = np.full(count, speed, dtype=np.float64)
+        # 文字列の長さを画面の高さに基づいて動的に決定
+        self.length = self.rng.integers(screen_height // font_size, (screen_height // font_size) * 2 + 1, size=count)
+        # 文字は MATRIX_GLYPHS 内の番号で保持する (筋ごとの長さを超える列は使わない)
+        self.symbols = self.rng.integers(0, len(MATRIX_GLYPHS), size=(count, max(self.length, default=1)))
+        self.atlas = GlyphAtlas.get(font_name, font_size)
+        self.pending = [] # 入れ替わってストリップへの反映を待っている (筋の番号, 位置) の配列の組
+
+        # 各位置の文字の色 (アトラスの行)。先頭の文字は白っぽく明るく、後続は緑のグラデーション
+        self.levels = np.zeros(self.symbols.shape, dtype=np.int64)
+        for column, length in enumerate(self.length.tolist()):
+            self.levels[column, :length] = [GlyphAtlas.level_for(255 - (i * (255 // length))) for i in range(length)]
+            self.levels[column, length - 1] = MATRIX_GRADIENT_LEVELS
+
+        # 列ストリップ: 位置iの文字は、ストリップの上から (length - 1 - i) 行目に置く (i=0が一番下)
+        self.strip_height = (self.length - 1) * font_size + self.atlas.cell_height
+        self.strips = []
+        for column, length in enumerate(self.length.tolist()):
+            strip = pygame.Surface((self.atlas.cell_width, int(self.strip_height[column])))
+            strip.fill(BLACK)
+            strip.set_colorkey(BLACK) # 隣の列と重なる部分で背景の黒が上書きしないように抜く
+            # 元の描画順 (i=0から上へ) で重ねて描く
+            strip.blits([(self.atlas.surface, (0, self._strip_y(column, i)), self._glyph_area(column, i)) for i in range(length)],
+                        doreturn=False)
+            self.strips.append(strip)
+
+    def __len__(self):
+        return len(self.strips)
+
+    def _strip_y(self, column, i):
+        """筋columnの位置iの文字のストリップ上のY座標"""
+        return int(self.length[column] - 1 - i) * self.font_size
+
+    def _glyph_area(self, column, i):
+        """筋columnの位置iの文字のアトラス上の領域"""
+        return self.atlas.areas[self.levels[column, i]][self.symbols[column, i]]
+
+    def _redraw_rows(self):
+        """入れ替わった文字の行だけをストリップに描き直す"""
+        atlas_surface = self.atlas.surface
+        for columns, rows in self.pending:
+            for column, i in zip(columns.tolist(), rows.tolist()):
+                strip = self.strips[column]
+                # 行の高さはフォントサイズより少し大きく上下の文字と重なるため、この行の範囲に限って
+                # 下の文字・この文字・上の文字を元の描画順で重ね直す
+                strip.set_clip(pygame.Rect(0, self._strip_y(column, i), self.atlas.cell_width, self.atlas.cell_height))
+                strip.fill(BLACK)
+                for j in range(max(0, i - 1), min(int(self.length[column]), i + 2)):
+                    strip.blit(atlas_surface, (0, self._strip_y(column, j)), self._glyph_area(column, j))
+                strip.set_clip(None)
+        self.pending.clear()
+
+    def update(self, step=1.0, mutation_rate=MATRIX_MUTATION_RATE, columns=None):
+        """
+        文字の雨の位置をstep (基準フレーム単位) だけ更新する。
+        columnsに筋の番号の配列を渡すと、その筋だけを動かす (描画負荷の自動調整用)
+        """
+        if columns is None:
+            columns = np.arange(len(self))
+        self.y[columns] += self.speed[columns] * step
         # 筋全体が画面外に出たら、Y座標をリセット
-        if self.y - (self.length * self.font_size) > self.screen_height:
-            self.y = random.randint(-200, 0)
-        # 一定の確率で文字をランダムに入れ替える
-        if random.randint(1, 100) < 20: # 20%の確率で
-            self.symbols[random.randint(0, self.length - 1)] = random.choice(self.characters) # ランダムな文字に置き換え
+        wrapped = columns[self.y[columns] - self.length[columns] * self.font_size > self.screen_height]
+        self.y[wrapped] = self.rng.integers(-200, 1, size=len(wrapped))
+        # 一定の確率で文字をランダムに入れ替える (筋ごとに基準フレームあたりmutation_rateの確率で)
+        mutated = columns[self.rng.random(len(columns)) < mutation_rate * step]
+        if len(mutated):
+            rows = (self.rng.random(len(mutated)) * self.length[mutated]).astype(np.int64)
+            self.symbols[mutated, rows] = self.rng.integers(0, len(MATRIX_GLYPHS), size=len(mutated))
+            self.pending.append((mutated, rows))
+
+    def draw(self, screen, columns=None, return_rects=False):
+        """
+        筋の列ストリップのうち画面内に見える部分を、1回のblitsでまとめて描画する。
+        columnsに筋の番号の配列を渡すと、その筋だけを描画する。
+        return_rectsがTrueなら、描画した領域のリストを返す (ダーティ矩形描画用)
+        """
+        if self.pending:
+            self._redraw_rows()
+        if columns is None:
+            columns = np.arange(len(self))
+        top = self.y[columns].astype(np.int64) - (self.length[columns] - 1) * self.font_size # ストリップの上端の画面上のY座標
+        visible_top = np.maximum(0, -top)
+        visible_bottom = np.minimum(self.strip_height[columns], self.screen_height - top)
+        visible = visible_top < visible_bottom
+        width = self.atlas.cell_width
+        sequence = [
+            (self.strips[column], (x, dest_y), (0, area_top, width, area_bottom - area_top))
+            for column, x, dest_y, area_top, area_bottom in zip(
+                columns[visible].tolist(), self.x[columns][visible].tolist(), (top + visible_top)[visible].tolist(),
+                visible_top[visible].tolist(), visible_bottom[visible].tolist())
+        ]
+        if return_rects:
+            return screen.blits(sequence)
+        screen.blits(sequence, doreturn=False)
+        return None
 
-    def draw(self, screen):
-        """文字の雨を描画する"""
-        for i, symbol in enumerate(self.symbols):
-            # 先頭の文字は白っぽく明るく、後続は緑のグラデーション
-            color = (200, 255, 200) if i == len(self.symbols) - 1 else (0, 255 - (i * (255 // self.length)), 70)
-            pos_y = self.y - (i * self.font_size)
-            if 0 < pos_y < self.screen_height:
-                symbol_surface = self.font.render(symbol, True, color)
-                screen.blit(symbol_surface, (self.x, pos_y))
-
-
-class Particle:
-    """花火の火花を表現するパーティクルクラス"""
-    def __init__(self, x, y, base_color, color_mode):
-        """パーティクルの初期化"""
-        self.x = x
-        self.y = y
+
+def hue_to_rgb(hue):
+    """色相の配列 (0.0〜1.0) を、彩度・明度が最大のRGB (0〜255) の配列に変換する"""
+    h6 = hue * 6.0
+    sector = np.floor(h6).astype(np.int64) % 6
+    f = h6 - np.floor(h6)
+    one = np.ones_like(f)
+    zero = np.zeros_like(f)
+    # colorsys.hsv_to_rgb (s=1, v=1) と同じ6区間の対応表
+    r = np.choose(sector, [one, 1 - f, zero, zero, f, one])
+    g = np.choose(sector, [f, one, one, 1 - f, zero, zero])
+    b = np.choose(sector, [zero, zero, f, one, one, 1 - f])
+    return (np.stack((r, g, b), axis=1) * 255).astype(np.int32)
+
+
+class CircleSpriteCache:
+    """
+    描画済みの円スプライトを (半径, 量子化した色) をキーに保持するLRUキャッシュ。
+    ボールやパーティクルを毎フレーム pygame.draw.circle で描く代わりに、スプライトをまとめてblitする。
+    ボールの色は衝突のたびにランダムに変わるため、色を64色のパレットに量子化して、
+    キーの種類がキャッシュの容量に収まるようにする (収まらないと毎フレーム描き直すことになり、かえって遅くなる)。
+    """
+    def __init__(self, max_size=SPRITE_CACHE_SIZE):
+        self.max_size = max_size
+        self.sprites = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_keys(radii, colors):
+        """半径と色の配列から、(半径, 量子化した色) を1つの整数にまとめたキーの配列を作る"""
+        # 量子化後の各成分は区間の中央値 (32〜224) になるため、カラーキーの黒と重なることはない
+        quantized = (np.asarray(colors, dtype=np.int64) // SPRITE_COLOR_STEP) * SPRITE_COLOR_STEP + SPRITE_COLOR_STEP // 2
+        return ((np.asarray(radii, dtype=np.int64) << 24)
+                | (quantized[:, 0] << 16) | (quantized[:, 1] << 8) | quantized[:, 2])
+
+    def get(self, key):
+        """キーに対応する円スプライトを返す。キャッシュになければ描画して追加する。"""
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        radius = key >> 24
+        color = ((key >> 16) & 0xFF, (key >> 8) & 0xFF, key & 0xFF)
+        sprite = pygame.Surface((radius * 2, radius * 2))
+        sprite.fill(BLACK)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        sprite.set_colorkey(BLACK)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_size:
+            self.sprites.popitem(last=False) # 最も長く使われていないスプライトを破棄
+        return sprite
+
+    @property
+    def hit_rate(self):
+        """これまでのキャッシュヒット率 (0.0〜1.0)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def draw(self, screen, xs, ys, radii, colors, return_rects=False):
+        """
+        中心座標・半径・色の配列で指定された円を、スプライトのblitでまとめて描画する。
+        return_rectsがTrueなら、描画した領域のリストを返す (ダーティ矩形描画用)
+        """
+        if len(xs) == 0:
+            return []
+        # 同じキーの円は多いため、キャッシュの参照はキーの種類ごとに1回だけ行う。
+        # ヒットとミスもキーの種類ごとに数える (このフレームより前からスプライトがあったかどうか)
+        unique_keys, inverse = np.unique(self.make_keys(radii, colors), return_inverse=True)
+        get = self.get
+        unique_sprites = [get(key) for key in unique_keys.tolist()]
+        sprites = [unique_sprites[index] for index in inverse.tolist()]
+        blit_sequence = list(zip(sprites, zip((xs - radii).tolist(), (ys - radii).tolist())))
+        if return_rects:
+            return screen.blits(blit_sequence)
+        # pygame-ceでは戻り値を返さない高速版のfblitsが使える
+        fblits = getattr(screen, "fblits", None)
+        if fblits:
+            fblits(blit_sequence)
+        else:
+            screen.blits(blit_sequence, doreturn=False)
+        return None
+
+    def log_stats(self, label):
+        """キャッシュのサイズ調整用に、ヒット率 (フレームごとのキーの種類単位) と保持数をログに出力する"""
+        logging.info(f"{label}: ヒット率 {self.hit_rate:.1%} (ヒット {self.hits} / ミス {self.misses}), 保持数 {len(self.sprites)}/{self.max_size}")
+
+
+class ParticlePool:
+    """
+    花火の火花を管理する固定容量のパーティクルプール。
+    位置・速度・色・寿命を事前に確保した配列で保持し、生存中のパーティクルは配列の先頭から詰めて格納する。
+    生成は空きスロットへの書き込みだけで済み、寿命が尽きたスロットは更新時にまとめて詰め直す。
+    容量を超えた場合は、リングバッファとして古いパーティクルから上書きする。
+    同時に存在できる数は、set_limit() で容量より小さく制限できる (描画が間に合わない場合の負荷軽減用)。
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.limit = capacity # 同時に存在できるパーティクルの上限
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.dx = np.zeros(capacity)
+        self.dy = np.zeros(capacity)
+        self.lifespan = np.zeros(capacity) # フレーム数での寿命
+        self.color = np.zeros((capacity, 3), dtype=np.int32)
+        self.count = 0  # 生存中のパーティクル数
+        self.cursor = 0 # 満杯時に次に上書きするスロット
+        self.rng = np.random.default_rng()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """すべてのパーティクルを消去する"""
+        self.count = 0
+        self.cursor = 0
+
+    def set_limit(self, limit):
+        """同時に存在できるパーティクルの上限を変更する。上限を超えている分は新しいものから取り除く"""
+        self.limit = max(1, min(int(limit), self.capacity))
+        self.count = min(self.count, self.limit)
+        self.cursor %= self.limit
+
+    def _allocate(self, amount):
+        """amount個分の書き込み先スロットを確保する。空きが足りない分は古いスロットを上書きする。"""
+        free = min(amount, self.limit - self.count)
+        slots = np.arange(self.count, self.count + free)
+        self.count += free
+        overflow = min(amount - free, self.limit)
+        if overflow > 0:
+            # 先頭ほど古いパーティクルなので、先頭から順に上書きしていく
+            ring = (self.cursor + np.arange(overflow)) % self.limit
+            self.cursor = int(ring[-1] + 1) % self.limit
+            slots = np.concatenate((slots, ring))
+        return slots
+
+    def emit(self, events, count_range, color_mode):
+        """
+        衝突イベント (x座標, y座標, 色の配列) ごとに、count_range (最小, 最大) 個の火花を放射状に生成する。
+        """
+        xs, ys, base_colors = events
+        if len(xs) == 0:
+            return
+        amounts = self.rng.integers(count_range[0], count_range[1] + 1, size=len(xs))
+        slots = self._allocate(int(amounts.sum()))
+        total = len(slots)
+        # 容量を超えて切り捨てられた分は、最後のイベントから削る
+        source = np.repeat(np.arange(len(xs)), amounts)[:total]
+
+        self.x[slots] = xs[source]
+        self.y[slots] = ys[source]
 
         if color_mode == ParticleColorMode.RAINBOW:
-            # HSV色空間でランダムな虹色を生成し、RGBに変換
-            hue = random.random()  # 0.0から1.0のランダムな色相
-            saturation = 1.0       # 彩度は最大で鮮やかに
-            value = 1.0            # 明度も最大で明るく
-            rgb_float = colorsys.hsv_to_rgb(hue, saturation, value)
-            self.color = tuple(int(c * 255) for c in rgb_float)
+            # HSV色空間でランダムな虹色を生成し (彩度・明度は最大)、RGBに変換
+            self.color[slots] = hue_to_rgb(self.rng.random(total))
         else:  # デフォルトは LINKED
             # 衝突したオブジェクトの色を少し明るくして火花らしくする
-            self.color = tuple(min(255, c + 40) for c in base_color)
-        
+            self.color[slots] = np.minimum(255, np.asarray(base_colors)[source] + 40)
+
         # 放射状に飛び散るランダムな速度
-        angle = random.uniform(0, 2 * math.pi)
-        speed = random.uniform(1, 4)
-        self.dx = math.cos(angle) * speed
-        self.dy = math.sin(angle) * speed
+        angle = self.rng.uniform(0, 2 * math.pi, total)
+        speed = self.rng.uniform(1, 4, total)
+        self.dx[slots] = np.cos(angle) * speed
+        self.dy[slots] = np.sin(angle) * speed
+        self.lifespan[slots] = self.rng.integers(25, 51, size=total)
+
+    def update(self, step=1.0):
+        """全パーティクルをstep (基準フレーム単位) だけ移動させ、寿命が尽きたものを取り除く"""
+        n = self.count
+        if n == 0:
+            return
+        self.dy[:n] += PARTICLE_GRAVITY * step # 重力の影響
+        self.x[:n] += self.dx[:n] * step
+        self.y[:n] += self.dy[:n] * step
+        self.lifespan[:n] -= step
+
+        alive = self.lifespan[:n] > 0
+        if not alive.all():
+            # 生存しているパーティクルを順序を保ったまま先頭に詰める
+            keep = np.flatnonzero(alive)
+            for array in (self.x, self.y, self.dx, self.dy, self.lifespan, self.color):
+                array[:keep.size] = array[keep]
+            self.count = keep.size
+            self.cursor = 0
+
+    def draw(self, screen, sprites, return_rects=False):
+        """全パーティクルを円スプライトのキャッシュを使って描画する"""
+        n = self.count
+        # 寿命に応じてサイズを小さくする
+        sizes = np.maximum(1, (self.lifespan[:n] / 12).astype(np.int32))
+        return sprites.draw(screen, self.x[:n], self.y[:n], sizes, self.color[:n], return_rects)
 
-        self.lifespan = random.randint(25, 50)  # フレーム数での寿命
-        self.gravity = 0.1 # 重力加速度
 
-    def move(self):
-        """パーティクルを移動させる"""
-        self.dy += self.gravity # 重力の影響
-        self.x += self.dx
-        self.y += self.dy
-        self.lifespan -= 1
+def sorted_unique(keys):
+    """整数の配列を昇順に並べ、重複を除いて返す (小さな配列ではnp.uniqueより軽い)"""
+    keys = np.sort(keys)
+    if keys.size:
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return keys
 
-    def draw(self, screen):
-        """パーティクルを描画する"""
-        # 寿命に応じてサイズを小さくする
-        size = max(1, int(self.lifespan / 12))
-        pygame.draw.circle(screen, self.color, (self.x, self.y), size)
+def random_ball_colors(rng, count):
+    """ボール用のランダムな色 (各成分50〜255) をまとめて生成する"""
+    return rng.integers(50, 256, size=(count, 3), dtype=np.int32)
 
+class BallRandom:
+    """
+    衝突時のボールの色と半径の振り直しに使う乱数。
+    値は (シード, ステップ数, ボールの番号, 用途) だけから決まる (splitmix64のハッシュ) ため、
+    帯の境界付近のボールを隣り合うワーカーがそれぞれ計算しても、同じボールには同じ色と半径が出る。
+    """
+    WALL_COLOR = 1
+    WALL_RADIUS = 2
+    COLLISION_COLOR = 3
+
+    def __init__(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.tick = 0 # move() のたびに1増える
+
+    def advance(self):
+        self.tick += 1
+
+    def _bits(self, ids, purpose, columns):
+        """ボールごと・列ごとの64ビットの乱数を (len(ids), columns) の配列で返す"""
+        key = (self.seed ^ (self.tick * 0xBF58476D1CE4E5B9) ^ (purpose << 56)) & 0xFFFFFFFFFFFFFFFF
+        x = np.asarray(ids, dtype=np.uint64)[:, None] * np.uint64(0x9E3779B97F4A7C15) ^ np.uint64(key)
+        x = x + np.arange(columns, dtype=np.uint64) * np.uint64(0xD1B54A32D192ED03)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+        return x
+
+    def integers(self, ids, purpose, low, high, columns=1):
+        """low以上high未満の整数を (len(ids), columns) の配列で返す"""
+        return (self._bits(ids, purpose, columns) % np.uint64(high - low)).astype(np.int64) + low
+
+    def colors(self, ids, purpose):
+        """ボール用のランダムな色 (各成分50〜255)"""
+        return self.integers(ids, purpose, 50, 256, 3).astype(np.int32)
+
+# 空間ハッシュで調べる近傍セルのオフセット (自セル + 右・下方向の半分だけを見ることで、同じ組を2回列挙しない)
+NEIGHBOR_CELL_OFFSETS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+# 一部のボールについてだけ組を探す場合は、対称性が使えないため周囲9セルすべてを調べる
+ALL_NEIGHBOR_CELL_OFFSETS = tuple((offset_x, offset_y) for offset_x in (-1, 0, 1) for offset_y in (-1, 0, 1))
+
+# BallSystemが持つ浮動小数点の配列 (共有メモリへの配置順)
+BALL_STATE_FIELDS = ("x", "y", "dx", "dy", "radius", "mass", "prev_x", "prev_y")
+
+class BallSystem:
+    """
+    ボール群の位置・速度・半径・質量・色をNumPy配列 (Structure of Arrays) で保持し、
+    移動・壁での反射・ボール同士の衝突をまとめて計算するクラス
+    """
+    def __init__(self, count, max_velocity, screen_width, screen_height):
+        """ボール群の初期化"""
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.rng = np.random.default_rng()
 
-class Ball:
-    """ボールの動きや外観を管理するクラス"""
-    def __init__(self, max_velocity, screen_width, screen_height):
-        """ボールの初期化"""
         # ランダムな半径と色を設定
-        self.radius = random.randrange(MIN_BALL_RADIUS, MAX_BALL_RADIUS)
+        self.radius = self.rng.integers(MIN_BALL_RADIUS, MAX_BALL_RADIUS, size=count).astype(np.float64)
         # 画面内に完全に収まるように、ランダムな位置を設定
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.x = random.randrange(self.radius, self.screen_width - self.radius)
-        self.y = random.randrange(self.radius, self.screen_height - self.radius)
-        self.mass = self.radius ** 2  # 質量は半径の2乗に比例させる
-        self.color = (random.randrange(50, 256), random.randrange(50, 256), random.randrange(50, 256))
+        self.x = np.floor(self.rng.uniform(self.radius, screen_width - self.radius))
+        self.y = np.floor(self.rng.uniform(self.radius, screen_height - self.radius))
+        self.mass = self.radius ** 2  # 質量は半径の2乗に比例させる (初期半径で固定)
+        self.color = random_ball_colors(self.rng, count)
         # 0と1を除いた速度の選択肢を生成
         velocity_choices = list(range(-max_velocity, -1)) + list(range(2, max_velocity + 1))
         if not velocity_choices:  # max_velocityが2未満の場合のフォールバック
             velocity_choices = [-2, 2]
-        self.dx = random.choice(velocity_choices)
-        self.dy = random.choice(velocity_choices)
-
-    def move(self):
-        """ボールを移動させ、壁で反射させる。壁との衝突情報を返す。"""
-        self.x += self.dx
-        self.y += self.dy
-
-        collided = False
-        # 左右の壁で反射
-        if self.x < self.radius or self.x > self.screen_width - self.radius:
-            self.dx *= -1
-            self.x = max(self.radius, min(self.x, self.screen_width - self.radius))
-            collided = True
-        # 上下の壁で反射
-        if self.y < self.radius or self.y > self.screen_height - self.radius:
-            self.dy *= -1
-            self.y = max(self.radius, min(self.y, self.screen_height - self.radius))
-            collided = True
-
-        if collided:
-            collision_info = (self.x, self.y, self.color)  # 衝突時の情報を保存
+        self.dx = self.rng.choice(velocity_choices, size=count).astype(np.float64)
+        self.dy = self.rng.choice(velocity_choices, size=count).astype(np.float64)
+        # 描画時の補間用に、直前のステップの位置を保持
+        self.prev_x = self.x.copy()
+        self.prev_y = self.y.copy()
+        self.random = BallRandom() # 衝突時の色と半径の振り直し用
+        self.ids = None # 各ボールの全体での番号 (Noneなら配列の位置と同じ)
+
+    @classmethod
+    def from_arrays(cls, arrays, color, screen_width, screen_height, ball_random=None, ids=None):
+        """
+        既存の配列 (共有メモリ上のビューなど) をコピーせずにそのまま使うボール群を作る。
+        arraysは BALL_STATE_FIELDS の各名前から配列への辞書。
+        idsは各ボールの全体での番号 (一部のボールだけを取り出した場合に、振り直しの乱数をボールごとに揃えるため)
+        """
+        balls = cls.__new__(cls)
+        balls.screen_width = screen_width
+        balls.screen_height = screen_height
+        balls.rng = np.random.default_rng()
+        balls.random = ball_random if ball_random is not None else BallRandom()
+        balls.ids = ids
+        for name in BALL_STATE_FIELDS:
+            setattr(balls, name, arrays[name])
+        balls.color = color
+        return balls
+
+    def __len__(self):
+        return len(self.x)
+
+    def head(self, count):
+        """先頭count個のボールだけを扱うボール群を返す。配列はビューなので、計算結果は元のボール群に反映される"""
+        if count >= len(self):
+            return self
+        return BallSystem.from_arrays({name: getattr(self, name)[:count] for name in BALL_STATE_FIELDS},
+                                      self.color[:count], self.screen_width, self.screen_height, self.random,
+                                      None if self.ids is None else self.ids[:count])
+
+    def _ids(self, index):
+        """配列の位置indexのボールの、全体での番号"""
+        return index if self.ids is None else self.ids[index]
+
+    def move(self, step=1.0):
+        """
+        全ボールをstep (基準フレーム単位) だけ移動させ、壁で反射させる。
+        壁に衝突したボールの (x, y, 衝突前の色) を配列で返す。
+        """
+        width, height = self.screen_width, self.screen_height
+        self.random.advance()
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        self.x += self.dx * step
+        self.y += self.dy * step
+
+        # 左右・上下の壁で反射
+        hit_x = (self.x < self.radius) | (self.x > width - self.radius)
+        hit_y = (self.y < self.radius) | (self.y > height - self.radius)
+        self.dx[hit_x] *= -1
+        self.dy[hit_y] *= -1
+        np.clip(self.x, self.radius, width - self.radius, out=self.x)
+        np.clip(self.y, self.radius, height - self.radius, out=self.y)
+
+        hit = np.flatnonzero(hit_x | hit_y)
+        events = (self.x[hit], self.y[hit], self.color[hit])  # 衝突時の情報を保存 (インデックス参照なのでコピーになる)
+        if hit.size:
             # 色と半径を変更
-            self.color = (random.randrange(50, 256), random.randrange(50, 256), random.randrange(50, 256))
-            self.radius = random.randrange(MIN_BALL_RADIUS, MAX_BALL_RADIUS)
+            self.color[hit] = self.random.colors(self._ids(hit), BallRandom.WALL_COLOR)
+            self.radius[hit] = self.random.integers(self._ids(hit), BallRandom.WALL_RADIUS, MIN_BALL_RADIUS, MAX_BALL_RADIUS)[:, 0]
             # 半径が変わったので、再度壁に埋まらないように位置を調整
-            self.x = max(self.radius, min(self.x, self.screen_width - self.radius))
-            self.y = max(self.radius, min(self.y, self.screen_height - self.radius))
-            return collision_info
-        return None
+            np.clip(self.x, self.radius, width - self.radius, out=self.x)
+            np.clip(self.y, self.radius, height - self.radius, out=self.y)
+        return events
+
+    def _candidate_pairs(self, balls=None):
+        """
+        一様グリッド(空間ハッシュ)で、衝突の可能性があるボールの組 (i, j) を配列でまとめて列挙する。
+        セルの一辺は最大直径なので、衝突し得る組は必ず隣接セルに入る。
+        ballsにボールの番号の配列を渡すと、そのボールを含む組だけを列挙する。
+        """
+        count = len(self.x)
+        if count < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # めり込み解消で画面外にはみ出した場合に備え、1セル分ずらして負のセル番号をなくす
+        cell_x = np.maximum(np.floor(self.x / COLLISION_CELL_SIZE).astype(np.int64) + 1, 0)
+        cell_y = np.maximum(np.floor(self.y / COLLISION_CELL_SIZE).astype(np.int64) + 1, 0)
+        stride = int(cell_y.max()) + 2 # 隣のセル(+1)が次の列と重ならないように余裕を持たせる
+        keys = cell_x * stride + cell_y
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        if balls is None:
+            queries, offsets = np.arange(count), np.array(NEIGHBOR_CELL_OFFSETS)
+        else:
+            queries, offsets = balls, np.array(ALL_NEIGHBOR_CELL_OFFSETS)
+        # 全ての近傍セルについて、セルに入っているボールの範囲をソート済みのキーから二分探索でまとめて求める
+        target = ((cell_x[queries] + offsets[:, :1]) * stride + (cell_y[queries] + offsets[:, 1:])).ravel()
+        start = np.searchsorted(sorted_keys, target, side="left")
+        counts = np.searchsorted(sorted_keys, target, side="right") - start
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        first = np.repeat(np.tile(queries, len(offsets)), counts)
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(start, counts) + run_offsets]
+        # 同じセル内は i < j の組だけを残す (一部のボールだけの場合は自分自身との組だけを除く)
+        if balls is None:
+            keep = (first < second) | (keys[first] != keys[second])
+        else:
+            keep = first != second
+        first, second = first[keep], second[keep]
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        if balls is not None:
+            # 両方のボールがballsに含まれる組は2回見つかるため、重複を除く
+            keys = sorted_unique(first * count + second)
+            return keys // count, keys % count
+        # 総当たりと同じ (i, j) の昇順に並べる
+        order = np.argsort(first * count + second)
+        return first[order], second[order]
+
+    def collide(self):
+        """
+        ボール同士の衝突を判定し、弾性衝突の反発をまとめて計算する。衝突した組の (中点x, 中点y, 火花の色) を配列で返す。
+        1つのボールが複数の組に含まれる場合は、ボールが重複しない組ごとにラウンドを分けて順に処理する
+        (総当たりで1組ずつ処理していたときと同様に、前の組の結果を反映した位置と速度で判定する)。
+        めり込み解消で動いたボールは新たに別のボールと重なることがあるため、ラウンドごとに動いたボールを含む近傍セルの組を
+        判定し直す。総当たりのときと同じく、1つの組が反発するのは1ステップに1回までとする。
+        近傍セルの組はステップの最初に1回だけ集め、COLLISION_REQUERY_DISTANCE 以上動いたボールについてだけ集め直す。
+        新たに重なった組を拾い直すのは、最初の COLLISION_RECHECK_ROUNDS ラウンドで動いたボールまでとする
+        (どちらの場合も、拾えなかった重なりは次のステップで処理される)。
+        """
+        count = len(self.x)
+        near_i, near_j = i, j = self._candidate_pairs()
+        # 近傍セルの組を集めたときの位置
+        anchor_x = self.x.copy()
+        anchor_y = self.y.copy()
+        responded = np.empty(0, dtype=np.int64) # このステップで反発済みの組 (i * count + j)
+        events = []
+        rounds = 0
+        while i.size:
+            # 衝突を検出
+            coll_vec_x = self.x[j] - self.x[i]
+            coll_vec_y = self.y[j] - self.y[i]
+            hit = coll_vec_x ** 2 + coll_vec_y ** 2 < (self.radius[i] + self.radius[j]) ** 2
+            i, j = i[hit], j[hit]
+            if i.size == 0:
+                break
+            # 各ボールが最初に現れる組だけをこのラウンドで処理する
+            pair_ids = np.arange(i.size)
+            first_pair = np.full(count, i.size)
+            np.minimum.at(first_pair, i, pair_ids)
+            np.minimum.at(first_pair, j, pair_ids)
+            chosen = (first_pair[i] == pair_ids) & (first_pair[j] == pair_ids)
+            events.append(self._respond(i[chosen], j[chosen]))
+            responded = np.sort(np.concatenate((responded, i[chosen] * count + j[chosen])))
+            rounds += 1
+            if rounds > COLLISION_RECHECK_ROUNDS:
+                i, j = i[~chosen], j[~chosen]
+                continue
+
+            moved_balls = np.concatenate((i[chosen], j[chosen]))
+            drift = (self.x[moved_balls] - anchor_x[moved_balls]) ** 2 + (self.y[moved_balls] - anchor_y[moved_balls]) ** 2
+            far = moved_balls[drift >= COLLISION_REQUERY_DISTANCE ** 2]
+            if far.size:
+                # 大きく動いたボールは、今の位置で近傍セルの組を集め直す
+                new_i, new_j = self._candidate_pairs(far)
+                keys = sorted_unique(np.concatenate((near_i * count + near_j, new_i * count + new_j)))
+                near_i, near_j = keys // count, keys % count
+                anchor_x[far] = self.x[far]
+                anchor_y[far] = self.y[far]
+
+            # 動いたボールを含む近傍セルの組を、残りの組と合わせて次のラウンドの候補にする
+            # (動いていないボール同士の組は、このラウンドの判定結果がそのまま使える)
+            moved = np.zeros(count, dtype=bool)
+            moved[moved_balls] = True
+            near_moved = moved[near_i] | moved[near_j]
+            keys = sorted_unique(np.concatenate((i[~chosen] * count + j[~chosen], near_i[near_moved] * count + near_j[near_moved])))
+            position = np.minimum(np.searchsorted(responded, keys), responded.size - 1)
+            keys = keys[responded[position] != keys]
+            i, j = keys // count, keys % count
+
+        if not events:
+            return (np.empty(0), np.empty(0), np.empty((0, 3), dtype=np.int32))
+        return tuple(np.concatenate(parts) for parts in zip(*events))
+
+    def _respond(self, i, j):
+        """ボールが重複しない衝突中の組 (i, j) について、色の変更と弾性衝突の反発をまとめて行う"""
+        # 衝突ベクトル
+        coll_vec_x = self.x[j] - self.x[i]
+        coll_vec_y = self.y[j] - self.y[i]
+        dist = np.sqrt(coll_vec_x ** 2 + coll_vec_y ** 2)
+
+        # 衝突したら両方のボールの色をランダムに変更
+        self.color[i] = self.random.colors(self._ids(i), BallRandom.COLLISION_COLOR)
+        self.color[j] = self.random.colors(self._ids(j), BallRandom.COLLISION_COLOR)
+
+        # --- 花火エフェクト用の情報 ---
+        collision_x = (self.x[i] + self.x[j]) / 2
+        collision_y = (self.y[i] + self.y[j]) / 2
+        # 衝突した両方のボールの色を混ぜて使う
+        particle_color = (self.color[i] + self.color[j]) // 2
+
+        # --- リアルな物理演算による反発処理 ---
+        # ゼロ除算を避ける
+        dist[dist == 0] = 1
+
+        # 1. 単位法線ベクトルと単位接線ベクトル
+        un_x = coll_vec_x / dist
+        un_y = coll_vec_y / dist
+        ut_x = -un_y
+        ut_y = un_x
+
+        # 2. 速度を法線・接線方向に分解 (ドット積)
+        v1n = self.dx[i] * un_x + self.dy[i] * un_y
+        v1t = self.dx[i] * ut_x + self.dy[i] * ut_y
+        v2n = self.dx[j] * un_x + self.dy[j] * un_y
+        v2t = self.dx[j] * ut_x + self.dy[j] * ut_y
+
+        # 3. 法線方向の新しい速度を計算 (1次元弾性衝突の公式)
+        m1, m2 = self.mass[i], self.mass[j]
+        v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
+        v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
+
+        # 4. 新しい速度ベクトルを計算し、ボールの速度を更新
+        self.dx[i] = (v1n_new * un_x) + (v1t * ut_x)
+        self.dy[i] = (v1n_new * un_y) + (v1t * ut_y)
+        self.dx[j] = (v2n_new * un_x) + (v2t * ut_x)
+        self.dy[j] = (v2n_new * un_y) + (v2t * ut_y)
+
+        # 5. 重なりの解消 (ボールがめり込むのを防ぐ)
+        overlap = (self.radius[i] + self.radius[j]) - dist
+        total_mass = m1 + m2
+        self.x[i] -= (overlap * (m2 / total_mass)) * un_x
+        self.y[i] -= (overlap * (m2 / total_mass)) * un_y
+        self.x[j] += (overlap * (m1 / total_mass)) * un_x
+        self.y[j] += (overlap * (m1 / total_mass)) * un_y
+
+        return (collision_x, collision_y, particle_color)
+
+    def draw(self, screen, sprites, alpha=1.0, return_rects=False):
+        """
+        全ボールを円スプライトのキャッシュを使って描画する。
+        alphaは直前のステップから現在位置までの補間係数
+        """
+        xs = self.prev_x + (self.x - self.prev_x) * alpha
+        ys = self.prev_y + (self.y - self.prev_y) * alpha
+        return sprites.draw(screen, xs, ys, self.radius, self.color, return_rects)
+
+
+class SharedBallBuffers:
+    """
+    ボールの状態を共有メモリ上のダブルバッファとして保持するクラス。
+    ワーカープロセスは表側 (front) を読んで裏側に次のステップの状態を書き込み、描画は表側だけを読む。
+    花火用のイベント (壁衝突・ボール同士の衝突) も、ワーカーごとの領域に書き込んで受け渡す。
+    """
+    EVENT_WALL = 0
+    EVENT_COLLISION = 1
+    EVENT_COLUMNS = 6 # 種類, x, y, r, g, b
+
+    def __init__(self, count, worker_count, name=None):
+        self.count = count
+        self.worker_count = worker_count
+        # 1ステップで1つのワーカーが出すイベント数の上限 (超えた分の花火は省略する)
+        self.event_capacity = max(64, count * 2)
+        float_bytes = 2 * len(BALL_STATE_FIELDS) * count * 8
+        color_bytes = 2 * count * 3 * 4
+        event_bytes = worker_count * self.event_capacity * self.EVENT_COLUMNS * 8
+        size = float_bytes + color_bytes + event_bytes + worker_count * 8
+        # nameを指定した場合はワーカー側から既存の共有メモリに接続する
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        buf = self.shm.buf
+        self.floats = np.ndarray((2, len(BALL_STATE_FIELDS), count), dtype=np.float64, buffer=buf)
+        self.colors = np.ndarray((2, count, 3), dtype=np.int32, buffer=buf, offset=float_bytes)
+        self.events = np.ndarray((worker_count, self.event_capacity, self.EVENT_COLUMNS), dtype=np.float64,
+                                 buffer=buf, offset=float_bytes + color_bytes)
+        self.event_counts = np.ndarray(worker_count, dtype=np.int64, buffer=buf,
+                                       offset=float_bytes + color_bytes + event_bytes)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def fields(self, index):
+        """バッファindex (0または1) の各配列を、BALL_STATE_FIELDS の名前をキーにした辞書で返す"""
+        return dict(zip(BALL_STATE_FIELDS, self.floats[index]))
+
+    def close(self, unlink=False):
+        """共有メモリを閉じる。作成側はunlink=Trueで破棄もする"""
+        # 共有メモリ上のビューが残っていると閉じられないため、先に参照を外す
+        self.floats = self.colors = self.events = self.event_counts = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _ball_worker_main(shm_name, count, worker_count, worker_index, screen_width, screen_height, seed, front, step_value, stop_flag, barrier):
+    """
+    ボールの物理演算を行うワーカープロセスの本体。
+    画面を横帯に分けたうち、worker_index番目の帯にいるボールを担当する。
+    帯の境界をまたいで衝突するボールを扱うため、帯の外側 BALL_STRIP_MARGIN の範囲のボールも含めて計算し、
+    結果は担当するボールの分だけをダブルバッファの裏側に書き込む。
+    色と半径の振り直しは全ワーカー共通のシードとステップ数から決まる乱数 (BallRandom) で行い、
+    周辺のボールを計算する隣のワーカーと結果が食い違わないようにする。
+    """
+    buffers = SharedBallBuffers(count, worker_count, name=shm_name)
+    ball_random = BallRandom(seed)
+    strip_height = screen_height / worker_count
+    # 画面外にはみ出したボールも必ずどこかの帯が担当するよう、両端の帯は無限に広げる
+    top = worker_index * strip_height if worker_index > 0 else -np.inf
+    bottom = (worker_index + 1) * strip_height if worker_index < worker_count - 1 else np.inf
+    try:
+        while True:
+            barrier.wait() # メインプロセスからの開始の合図を待つ
+            if stop_flag.value:
+                break
+            src_index = front.value
+            src = buffers.fields(src_index)
+            dst = buffers.fields(1 - src_index)
+            y = src["y"]
+            owned = (y >= top) & (y < bottom)
+            nearby = np.flatnonzero((y >= top - BALL_STRIP_MARGIN) & (y < bottom + BALL_STRIP_MARGIN))
+
+            # 担当範囲と周辺のボールだけを取り出して、通常と同じ手順で1ステップ進める
+            local = BallSystem.from_arrays({name: array[nearby] for name, array in src.items()},
+                                           buffers.colors[src_index][nearby], screen_width, screen_height, ball_random, nearby)
+            wall_x, wall_y, wall_color = local.move(step_value.value)
+            hit_x, hit_y, hit_color = local.collide()
+
+            owned_local = owned[nearby]
+            owned_index = nearby[owned_local]
+            for name, array in dst.items():
+                array[owned_index] = getattr(local, name)[owned_local]
+            buffers.colors[1 - src_index][owned_index] = local.color[owned_local]
+
+            # 花火のイベントは、発生位置が担当する帯の中にあるものだけを書き込む (帯の境界での重複を防ぐ)
+            events = buffers.events[worker_index]
+            written = 0
+            for kind, xs, ys, colors in ((SharedBallBuffers.EVENT_WALL, wall_x, wall_y, wall_color),
+                                         (SharedBallBuffers.EVENT_COLLISION, hit_x, hit_y, hit_color)):
+                inside = (ys >= top) & (ys < bottom)
+                amount = min(int(inside.sum()), buffers.event_capacity - written)
+                rows = events[written:written + amount]
+                rows[:, 0] = kind
+                rows[:, 1] = xs[inside][:amount]
+                rows[:, 2] = ys[inside][:amount]
+                rows[:, 3:6] = colors[inside][:amount]
+                written += amount
+            buffers.event_counts[worker_index] = written
+
+            barrier.wait() # 計算完了の合図
+    except threading.BrokenBarrierError:
+        pass # メインプロセス側で終了またはタイムアウトした
+    except Exception as e:
+        logging.error(f"ボールの物理演算ワーカー{worker_index}でエラーが発生しました: {e}", exc_info=True)
+        barrier.abort() # メインプロセスに異常を知らせる
+    finally:
+        buffers.close()
+
+
+class BallWorkerPool:
+    """
+    ボールの物理演算を複数のワーカープロセスに分担させるクラス。
+    ボールの状態は共有メモリのダブルバッファに置き、描画は表側 (balls) だけを読む。
+    advance() は前回開始したステップの完了を待ってから次のステップを開始するため、
+    最後に開始したステップの計算は描画処理と並行して進む。
+    """
+    def __init__(self, balls, worker_count):
+        self.worker_count = worker_count
+        self.screen_width = balls.screen_width
+        self.screen_height = balls.screen_height
+        self.buffers = SharedBallBuffers(len(balls), worker_count)
+        # 初期状態を表側のバッファにコピー
+        for name, array in self.buffers.fields(0).items():
+            array[:] = getattr(balls, name)
+        self.buffers.colors[0] = balls.color
+
+        self.front = multiprocessing.Value("i", 0, lock=False)
+        self.step_value = multiprocessing.Value("d", 1.0, lock=False)
+        self.stop_flag = multiprocessing.Value("b", 0, lock=False)
+        self.barrier = multiprocessing.Barrier(worker_count + 1)
+        self.in_flight = False # 計算中のステップがあるか
+        self.processes = [
+            multiprocessing.Process(
+                target=_ball_worker_main,
+                args=(self.buffers.name, len(balls), worker_count, index, self.screen_width, self.screen_height,
+                      balls.random.seed, self.front, self.step_value, self.stop_flag, self.barrier),
+                daemon=True,
+            )
+            for index in range(worker_count)
+        ]
+        for process in self.processes:
+            process.start()
+        self._update_view()
+        logging.info(f"ボールの物理演算を{worker_count}個のワーカープロセスで開始しました。")
+
+    def _update_view(self):
+        """描画用のボール群を、現在の表側のバッファを参照するように作り直す"""
+        index = self.front.value
+        self.balls = BallSystem.from_arrays(self.buffers.fields(index), self.buffers.colors[index],
+                                            self.screen_width, self.screen_height)
+
+    def _collect_events(self):
+        """完了したステップでワーカーが書き込んだ花火のイベントを、(壁衝突, ボール同士の衝突) の組で返す"""
+        counts = self.buffers.event_counts
+        events = np.concatenate([self.buffers.events[k, :counts[k]] for k in range(self.worker_count)])
+        result = []
+        for kind in (SharedBallBuffers.EVENT_WALL, SharedBallBuffers.EVENT_COLLISION):
+            rows = events[events[:, 0] == kind] # ブールインデックスなのでコピーになる
+            result.append((rows[:, 1], rows[:, 2], rows[:, 3:6].astype(np.int32)))
+        return tuple(result)
+
+    def advance(self, step):
+        """
+        前回開始したステップの完了を待って表裏を入れ替え、step (基準フレーム単位) の次のステップを開始する。
+        完了したステップの (壁衝突のイベント, ボール同士の衝突のイベント) を返す。
+        ワーカーが応答しない場合は threading.BrokenBarrierError を送出する。
+        """
+        if self.in_flight:
+            events = self.finish()
+        else:
+            empty = (np.empty(0), np.empty(0), np.empty((0, 3), dtype=np.int32))
+            events = (empty, empty)
+        self.step_value.value = step
+        self.barrier.wait(BALL_WORKER_TIMEOUT) # ワーカーに開始を合図
+        self.in_flight = True
+        return events
+
+    def finish(self):
+        """計算中のステップの完了を待って表裏を入れ替え、そのステップのイベントを返す"""
+        self.barrier.wait(BALL_WORKER_TIMEOUT)
+        self.in_flight = False
+        self.front.value = 1 - self.front.value
+        self._update_view()
+        return self._collect_events()
+
+    def snapshot(self):
+        """表側のバッファの内容をコピーした、メインプロセスで計算するためのボール群を返す"""
+        index = self.front.value
+        arrays = {name: array.copy() for name, array in self.buffers.fields(index).items()}
+        return BallSystem.from_arrays(arrays, self.buffers.colors[index].copy(), self.screen_width, self.screen_height)
+
+    def close(self):
+        """ワーカープロセスを終了させ、共有メモリを破棄する"""
+        try:
+            if self.in_flight:
+                self.finish()
+            self.stop_flag.value = 1
+            self.barrier.wait(BALL_WORKER_TIMEOUT) # 終了フラグを確認させるために待機を解除
+        except threading.BrokenBarrierError:
+            pass
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.balls = None
+        self.buffers.close(unlink=True)
+        logging.info("ボールの物理演算のワーカープロセスを終了しました。")
+
+
+class SimulationClock:
+    """
+    固定タイムステップのシミュレーション時計。
+    描画フレームごとの経過時間をアキュムレータに貯め、一定幅のステップに分けて物理演算を進める。
+    描画が60fpsに届かなくてもシミュレーションの速さは変わらず、余った時間は描画時の補間に使う。
+    """
+    def __init__(self, substeps=DEFAULT_PHYSICS_SUBSTEPS):
+        self.step = 1.0 / max(1, substeps)  # 1ステップで進める時間 (基準フレーム単位)
+        self.step_seconds = self.step / REFERENCE_FPS
+        self.accumulator = 0.0
+        self.last_time = None
+
+    def advance(self):
+        """前回呼び出しからの経過時間を貯め、今回実行すべきステップ数を返す"""
+        now = time.perf_counter()
+        if self.last_time is None:
+            self.last_time = now
+            return 0
+        elapsed = min(now - self.last_time, MAX_FRAME_TIME)
+        self.last_time = now
+        self.accumulator += elapsed
+        steps = int(self.accumulator // self.step_seconds)
+        self.accumulator -= steps * self.step_seconds
+        return steps
+
+    @property
+    def alpha(self):
+        """直前のステップから次のステップまでの補間係数 (0〜1)"""
+        return self.accumulator / self.step_seconds
+
+
+class AfterglowFader:
+    """
+    前フレームの描画を消さずに暗くする (残像効果) クラス。全体に AFTERGLOW_DECAY を掛け、AFTERGLOW_FLOOR を引く。
+    fill の special_flags による合成は遅い (1920x1080で1回20ms以上) ため、単色のタイルを
+    BLEND_RGB_MULT/BLEND_RGB_SUB で敷き詰めるようにblitする (SIMDが効き、2回合わせて1ms程度)。
+    """
+    def __init__(self):
+        self.key = None
+        self.sequence = []
+
+    def _build(self, surface):
+        """surfaceの幅と形式に合わせてタイルとblitの並びを作る"""
+        width, height = surface.get_size()
+        multiply = pygame.Surface((width, AFTERGLOW_TILE_HEIGHT), 0, surface)
+        multiply.fill(AFTERGLOW_DECAY)
+        subtract = pygame.Surface((width, AFTERGLOW_TILE_HEIGHT), 0, surface)
+        subtract.fill(AFTERGLOW_FLOOR)
+        rows = range(0, height, AFTERGLOW_TILE_HEIGHT)
+        self.sequence = ([(multiply, (0, y), None, pygame.BLEND_RGB_MULT) for y in rows] +
+                         [(subtract, (0, y), None, pygame.BLEND_RGB_SUB) for y in rows])
+        self.key = (width, height, surface.get_bitsize())
+
+    def apply(self, surface):
+        """surface全体を1段階暗くする"""
+        if self.key != (surface.get_width(), surface.get_height(), surface.get_bitsize()):
+            self._build(surface)
+        surface.blits(self.sequence, doreturn=False)
+
+
+class DirtyRectRenderer:
+    """
+    フレームの消去と画面への転送を受け持つクラス。
+    ダーティ矩形描画が有効な場合は、前フレームで描いた領域だけを黒で消し、
+    前フレームと今フレームで描いた領域だけを pygame.display.update で転送する。
+    無効な場合や、変化した領域が広すぎて効果がない場合は、全画面の塗りつぶしと flip を行う。
+    残像効果が有効な場合は、黒で消す代わりに前フレームを暗くして残す (全画面が変化するため常に flip する)。
+    """
+    def __init__(self, screen, enabled, afterglow=False):
+        self.enabled = enabled
+        self.afterglow = AfterglowFader() if afterglow else None
+        self.fading = False      # 今フレームで残像効果を使っているか
+        self.previous_rects = [] # 前フレームで描画した領域
+        self.rects = []          # 今フレームで描画した領域
+        self.reset(screen)
+
+    def reset(self, screen):
+        """画面を作り直した後に呼び出し、次のフレームを全画面で描き直す"""
+        self.screen = screen
+        self.screen_area = screen.get_width() * screen.get_height()
+        self.previous_rects = []
+        self.full_redraw = True
+
+    def begin_frame(self, fade=True):
+        """
+        前フレームの描画を消去する。残像効果が有効でfadeがTrueなら、消去せずに暗くして残す
+        (パスワード入力画面などでは fade=False で残像を消す)
+        """
+        self.fading = self.afterglow is not None and fade
+        if self.fading:
+            self.afterglow.apply(self.screen)
+        elif self.enabled and not self.full_redraw:
+            fill = self.screen.fill
+            for rect in self.previous_rects:
+                fill(BLACK, rect)
+        else:
+            self.screen.fill(BLACK)
+        self.rects = []
+
+    def add(self, rects):
+        """描画した領域 (Rect、またはRectのリスト) を登録する"""
+        if not self.enabled or rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            self.rects.append(rects)
+        else:
+            self.rects.extend(rects)
+
+    def _is_too_large(self):
+        """今フレームの更新領域が、全画面更新のほうが速いほど多い/広いか"""
+        if len(self.rects) > DIRTY_RECT_MAX_COUNT:
+            return True
+        area = sum(rect.width * rect.height for rect in self.rects)
+        return area > self.screen_area * DIRTY_RECT_FULL_UPDATE_RATIO
+
+    def present(self):
+        """描画結果を画面に転送する"""
+        if self.fading:
+            # 残像は画面全体に残るため、残像効果をやめた最初のフレームは全画面を塗りつぶす
+            pygame.display.flip()
+            self.full_redraw = True
+            self.previous_rects = []
+            return
+        if not self.enabled:
+            pygame.display.flip()
+            return
+
+        too_large = self._is_too_large()
+        if self.full_redraw or too_large:
+            pygame.display.flip()
+        else:
+            # 消した領域 (前フレーム) と描いた領域 (今フレーム) の両方を転送する
+            pygame.display.update(self.previous_rects + self.rects)
+        # 領域が広すぎた場合は、次のフレームも矩形ごとの消去をせず全画面を塗りつぶす
+        self.full_redraw = too_large
+        self.previous_rects = self.rects
+
+
+class FrameProfiler:
+    """
+    メインループの処理段階ごとの所要時間を計測するクラス。
+    mark(phase) を呼ぶたびに、前回のmarkからの経過時間をその段階の時間として積算する。
+    一定間隔で平均をとり、画面表示 (HUD) とログに出力する。無効な場合、markは何もしない。
+    """
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.hud_visible = False
+        self.hud_font = None
+        self.hud_surfaces = []
+        self.last_mark = time.perf_counter()
+        self.frame_start = self.last_mark
+        self.hud_window = self._new_window(self.last_mark)
+        self.log_window = self._new_window(self.last_mark)
+
+    @staticmethod
+    def _new_window(now):
+        """集計期間ごとの積算値"""
+        return {"start": now, "frames": 0, "max_frame": 0.0, "phases": collections.defaultdict(float)}
+
+    def mark(self, phase):
+        """前回のmarkから現在までの時間を、phaseの所要時間として積算する"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        elapsed = now - self.last_mark
+        self.hud_window["phases"][phase] += elapsed
+        self.log_window["phases"][phase] += elapsed
+        self.last_mark = now
+
+    def end_frame(self):
+        """1フレームの計測を終え、集計期間が過ぎていれば画面表示の更新とログ出力を行う"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        frame_time = now - self.frame_start
+        self.frame_start = now
+        for window in (self.hud_window, self.log_window):
+            window["frames"] += 1
+            window["max_frame"] = max(window["max_frame"], frame_time)
+
+        if now - self.hud_window["start"] >= PROFILER_HUD_INTERVAL:
+            if self.hud_visible:
+                self._render_hud(self._summary_lines(self.hud_window, now))
+            self.hud_window = self._new_window(now)
+        if now - self.log_window["start"] >= PROFILER_LOG_INTERVAL:
+            lines = self._summary_lines(self.log_window, now)
+            logging.info(f"フレーム計測: {lines[0]} | {', '.join(lines[1:])}")
+            self.log_window = self._new_window(now)
+
+    @staticmethod
+    def _summary_lines(window, now):
+        """集計期間の平均FPS・フレーム時間と、段階ごとの1フレームあたりの平均時間を文字列のリストにする"""
+        frames = max(1, window["frames"])
+        elapsed = now - window["start"]
+        lines = [f"{frames / elapsed:.1f} fps  frame {elapsed / frames * 1000:.2f} ms (max {window['max_frame'] * 1000:.2f} ms)"]
+        # 時間のかかっている段階から順に並べる
+        for phase, total in sorted(window["phases"].items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{phase} {total / frames * 1000:.2f} ms")
+        return lines
+
+    def toggle_hud(self):
+        """計測結果の画面表示を切り替える"""
+        self.hud_visible = not self.hud_visible
+        self.hud_surfaces = []
+
+    def _render_hud(self, lines):
+        """画面表示用の文字列を描画しておく (毎フレームは描画し直さない)"""
+        if self.hud_font is None:
+            self.hud_font = FontRegistry.get("consolas,dejavusansmono,monospace", PROFILER_HUD_FONT_SIZE)
+        self.hud_surfaces = [self.hud_font.render(line, True, PROFILER_HUD_COLOR, BLACK) for line in lines]
 
     def draw(self, screen):
-        """ボールを画面に描画する"""
-        pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)
+        """計測結果を画面の左上に描画し、描画した領域のリストを返す"""
+        rects = []
+        if not self.hud_visible:
+            return rects
+        y = 5
+        for surface in self.hud_surfaces:
+            rects.append(screen.blit(surface, (5, y)))
+            y += surface.get_height()
+        return rects
+
+
+class QualityGovernor:
+    """
+    1フレームの処理時間 (clock.tick の待機を除く) を目標と比べ、描画負荷を段階的に調整するクラス。
+    目標を超えた期間が続けば QUALITY_LEVELS の次のレベルに下げ、余裕が続けば1段階ずつ戻す。
+    無効な場合は常に最高品質 (レベル0) のまま。
+    """
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.level = 0
+        self.window_start = time.perf_counter()
+        self.busy_total = 0.0
+        self.frames = 0
+        self.headroom_count = 0 # 余裕のある評価が連続した回数
+        self._apply_level()
+
+    def _apply_level(self):
+        """現在のレベルの各倍率を属性に反映する"""
+        self.spark_scale, self.particle_scale, self.mutation_scale, self.object_scale = QUALITY_LEVELS[self.level]
+
+    def record(self, busy_time):
+        """
+        1フレームの処理時間 (秒) を記録する。評価間隔が過ぎていれば品質を見直し、レベルが変わった場合はTrueを返す。
+        """
+        if not self.enabled:
+            return False
+        self.busy_total += busy_time
+        self.frames += 1
+        now = time.perf_counter()
+        if now - self.window_start < QUALITY_EVAL_INTERVAL:
+            return False
+
+        average = self.busy_total / self.frames
+        self.window_start = now
+        self.busy_total = 0.0
+        self.frames = 0
+
+        previous = self.level
+        if average > QUALITY_TARGET_FRAME_TIME:
+            self.headroom_count = 0
+            self.level = min(self.level + 1, len(QUALITY_LEVELS) - 1)
+        elif average < QUALITY_TARGET_FRAME_TIME * QUALITY_RESTORE_RATIO and self.level > 0:
+            self.headroom_count += 1
+            if self.headroom_count >= QUALITY_RESTORE_DELAY:
+                self.headroom_count = 0
+                self.level -= 1
+        else:
+            self.headroom_count = 0
+
+        if self.level == previous:
+            return False
+        self._apply_level()
+        direction = "下げました" if self.level > previous else "戻しました"
+        logging.info(
+            f"描画負荷の自動調整: 平均処理時間 {average * 1000:.1f} ms (目標 {QUALITY_TARGET_FRAME_TIME * 1000:.1f} ms) のため、"
+            f"品質をレベル{self.level}に{direction} (火花 x{self.spark_scale}, パーティクル上限 x{self.particle_scale}, "
+            f"文字の入れ替え x{self.mutation_scale}, オブジェクト数 x{self.object_scale})"
+        )
+        return True
+
+    def spark_range(self, count_range):
+        """火花の生成数の範囲 (最小, 最大) を、現在の品質に合わせて減らす"""
+        low, high = count_range
+        return (max(1, int(low * self.spark_scale)), max(1, int(high * self.spark_scale)))
+
+    def active_count(self, count):
+        """count個のオブジェクトのうち、現在の品質で動かす数を返す"""
+        return max(1, int(count * self.object_scale))
+
+    def select_indices(self, count):
+        """count個のオブジェクトのうち、現在の品質で動かす分の番号を画面全体に散らばるように等間隔で選ぶ"""
+        active = self.active_count(count) if count else 0
+        if active >= count:
+            return np.arange(count)
+        return np.linspace(0, count - 1, active).astype(int)
+
+    def select(self, items):
+        """リストから、現在の品質で動かす分を画面全体に散らばるように等間隔で選ぶ"""
+        indices = self.select_indices(len(items))
+        if len(indices) >= len(items):
+            return items
+        return [items[i] for i in indices]
+
+
+def physics_substeps_for(substeps, max_velocity):
+    """
+    物理演算の分割数を決める。1ステップの移動量が最小半径を超えるとボール同士がすり抜けるため、
+    最大速度に応じて設定値より多く分割する。
+    """
+    return max(1, substeps, math.ceil(max_velocity / MIN_BALL_RADIUS))
 
 
 class CameraSurveillanceThread(threading.Thread):
@@ -695,6 +2918,7 @@ def cleanup_on_exit():
     # Pygameの終了
     if pygame.get_init():
         pygame.quit()
+        FontRegistry.clear()
     logging.info("...クリーンアップ処理完了")
 
 def main(settings):
@@ -717,6 +2941,12 @@ def main(settings):
     idle_timeout_ms = settings.get(CfgKey.IDLE_TIMEOUT, IDLE_TIMEOUT)
     ball_count = settings.get(CfgKey.BALL_COUNT, DEFAULT_BALL_COUNT)
     max_velocity = settings.get(CfgKey.MAX_VELOCITY, DEFAULT_MAX_VELOCITY)
+    physics_substeps = settings.get(CfgKey.PHYSICS_SUBSTEPS, DEFAULT_PHYSICS_SUBSTEPS)
+    dirty_rect_enabled = settings.get(CfgKey.DIRTY_RECT_ENABLED, DEFAULT_DIRTY_RECT_ENABLED)
+    afterglow_enabled = settings.get(CfgKey.AFTERGLOW_ENABLED, DEFAULT_AFTERGLOW_ENABLED)
+    ball_worker_count = settings.get(CfgKey.BALL_WORKERS, DEFAULT_BALL_WORKERS)
+    frame_profiler_enabled = settings.get(CfgKey.FRAME_PROFILER_ENABLED, DEFAULT_FRAME_PROFILER_ENABLED)
+    quality_governor_enabled = settings.get(CfgKey.QUALITY_GOVERNOR_ENABLED, DEFAULT_QUALITY_GOVERNOR_ENABLED)
     password_enabled = settings.get(CfgKey.PASSWORD_ENABLED, False)
     password_hash = settings.get(CfgKey.PASSWORD_HASH, None)
     password_ui_position = settings.get(CfgKey.PASSWORD_UI_POSITION, DEFAULT_PASSWORD_UI_POSITION)
@@ -729,8 +2959,13 @@ def main(settings):
     saver_mode = settings.get(CfgKey.SAVER_MODE, DEFAULT_SAVER_MODE)
     slideshow_folder = settings.get(CfgKey.SLIDESHOW_FOLDER, DEFAULT_SLIDESHOW_FOLDER)
     slideshow_interval_ms = settings.get(CfgKey.SLIDESHOW_INTERVAL, DEFAULT_SLIDESHOW_INTERVAL) * 1000
+    slideshow_cache_mb = settings.get(CfgKey.SLIDESHOW_CACHE_MB, DEFAULT_SLIDESHOW_CACHE_MB)
+    slideshow_recursive = settings.get(CfgKey.SLIDESHOW_RECURSIVE, DEFAULT_SLIDESHOW_RECURSIVE)
+    slideshow_memory_cache_mb = settings.get(CfgKey.SLIDESHOW_MEMORY_CACHE_MB, DEFAULT_SLIDESHOW_MEMORY_CACHE_MB)
+    slideshow_ken_burns = settings.get(CfgKey.SLIDESHOW_KEN_BURNS, DEFAULT_SLIDESHOW_KEN_BURNS)
     line_count = settings.get(CfgKey.LINE_COUNT, DEFAULT_LINE_COUNT)
     line_speed = settings.get(CfgKey.LINE_SPEED, DEFAULT_LINE_SPEED)
+    line_trail_length = settings.get(CfgKey.LINE_TRAIL_LENGTH, DEFAULT_LINE_TRAIL_LENGTH)
     matrix_font_size = settings.get(CfgKey.MATRIX_FONT_SIZE, DEFAULT_MATRIX_FONT_SIZE)
     matrix_speed = settings.get(CfgKey.MATRIX_SPEED, DEFAULT_MATRIX_SPEED)
     matrix_font = settings.get(CfgKey.MATRIX_FONT, DEFAULT_MATRIX_FONT)
@@ -749,30 +2984,43 @@ def main(settings):
         camera_capture_folder = os.path.join(BASE_PATH, camera_capture_folder)
 
     # 指定した数のボールオブジェクトを作成
-    balls = [Ball(max_velocity=max_velocity, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT) for _ in range(ball_count)]
+    balls = BallSystem(ball_count, max_velocity=max_velocity, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT)
+    # ワーカープロセス数が指定されていれば、ボールの物理演算を画面の横帯ごとに並列で行う
+    ball_workers = None
+    if saver_mode == SaverMode.BALLS and ball_worker_count > 0:
+        try:
+            ball_workers = BallWorkerPool(balls, ball_worker_count)
+        except (OSError, ValueError) as e:
+            logging.error(f"物理演算のワーカープロセスを開始できませんでした。メインプロセスで計算します: {e}")
 
-    # スライドショー用の変数
-    image_files = []
-    current_image_index = 0 
-    last_image_change_time = 0 
-    current_image_surface = None # 現在表示中の画像
-    next_image_surface = None    # フェードインしてくる次の画像
-    is_fading = False # フェード中かどうか
-    fade_start_time = 0 
+    # スライドショー
+    image_cache = ScaledImageCache(SCALED_IMAGE_CACHE_DIR, slideshow_cache_mb * 1024 * 1024) if slideshow_cache_mb > 0 else None
+    surface_cache = SurfaceLRUCache(slideshow_memory_cache_mb * 1024 * 1024) if slideshow_memory_cache_mb > 0 else None
+    slideshow = Slideshow(slideshow_folder, slideshow_interval_ms, SCREEN_WIDTH, SCREEN_HEIGHT, image_cache, slideshow_recursive, surface_cache,
+                          slideshow_ken_burns)
 
     # ラインアート用の変数
-    lines = []
+    lines = None
     # マトリックス用の変数
-    matrix_streams = []
-    # 花火用のパーティクルリスト
-    particles = []
+    matrix_rain = None
+    # 花火用のパーティクルプール
+    particles = ParticlePool(PARTICLE_POOL_CAPACITY)
+    # ボールとパーティクルで共有する円スプライトのキャッシュ
+    circle_sprites = CircleSpriteCache()
+    # フレームの消去と画面への転送 (ダーティ矩形描画が有効なら変化した領域だけを転送する)
+    renderer = DirtyRectRenderer(screen, dirty_rect_enabled, afterglow_enabled)
+    # 処理段階ごとの所要時間の計測
+    profiler = FrameProfiler(frame_profiler_enabled)
+    # 処理が間に合わない場合に火花やオブジェクトの数を減らす
+    governor = QualityGovernor(quality_governor_enabled)
 
     def start_saver_active_mode():
         """セーバーをアクティブ状態に移行するための初期化処理"""
-        nonlocal screen, state, image_files, current_image_index, current_image_surface, next_image_surface, is_fading, last_image_change_time, lines, matrix_streams
+        nonlocal screen, state, lines, matrix_rain
 
         # ウィンドウをフルスクリーンに戻す/設定する
         screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
+        renderer.reset(screen)
         state = "SAVER_ACTIVE"
         pygame.mouse.set_visible(False)
 
@@ -782,21 +3030,11 @@ def main(settings):
         # セーバーモードに応じた初期化
         current_time = pygame.time.get_ticks()
         if saver_mode == SaverMode.SLIDESHOW:
-            image_files = get_image_files(slideshow_folder)
-            if image_files:
-                random.shuffle(image_files)
-                current_image_index = -1
-                current_image_surface = None
-                next_image_surface = None
-                is_fading = False
-                last_image_change_time = current_time - slideshow_interval_ms - 1
-            else:
-                logging.warning(f"スライドショーフォルダ \"{slideshow_folder}\" に画像が見つかりません。")
+            slideshow.start(current_time)
         elif saver_mode == SaverMode.LINE_ART:
-            lines = [Line(max_speed=line_speed, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT) for _ in range(line_count)]
+            lines = LineArtSystem(line_count, line_speed, SCREEN_WIDTH, SCREEN_HEIGHT, line_trail_length)
         elif saver_mode == SaverMode.MATRIX:
-            stream_count = SCREEN_WIDTH // matrix_font_size
-            matrix_streams = [MatrixStream(i * matrix_font_size, matrix_font_size, matrix_speed, SCREEN_HEIGHT, matrix_font) for i in range(stream_count)]
+            matrix_rain = MatrixRain(SCREEN_WIDTH, SCREEN_HEIGHT, matrix_font_size, matrix_speed, matrix_font)
 
     # --- カメラ監視スレッドの開始 ---
     if camera_enabled and cv2:
@@ -817,6 +3055,8 @@ def main(settings):
         logging.warning("`pip install opencv-python` を実行してインストールしてください。")
 
     clock = pygame.time.Clock()
+    # 物理演算は描画とは独立した固定タイムステップで進める
+    sim_clock = SimulationClock(physics_substeps_for(physics_substeps, max_velocity))
     running = True
 
     # 状態管理: 'WAITING', 'SAVER_ACTIVE', 'PASSWORD_PROMPT'
@@ -830,15 +3070,15 @@ def main(settings):
     # 日本語表示のためのフォント設定
     # Windowsでは 'meiryo' や 'msgothic' が利用可能。'meiryo' を試し、失敗したらデフォルトフォントを使用。
 
-    try:
-        prompt_font = pygame.font.SysFont("meiryo", password_ui_font_size)
-        warning_font = pygame.font.SysFont("meiryo", int(password_ui_font_size / 2))
-        clock_font = pygame.font.SysFont("meiryo", clock_font_size)
-    except pygame.error:
+    if FontRegistry.resolve("meiryo"):
+        prompt_font = FontRegistry.get("meiryo", password_ui_font_size)
+        warning_font = FontRegistry.get("meiryo", int(password_ui_font_size / 2))
+        clock_font = FontRegistry.get("meiryo", clock_font_size)
+    else:
         logging.warning("\"meiryo\" フォントが見つかりません。UIの日本語が文字化けする可能性があります。")
-        prompt_font = pygame.font.Font(None, password_ui_font_size) # デフォルトフォント
-        warning_font = pygame.font.Font(None, int(password_ui_font_size / 2))
-        clock_font = pygame.font.Font(None, int(clock_font_size * 1.2)) # 代替フォントのサイズ調整
+        prompt_font = FontRegistry.get(None, password_ui_font_size) # デフォルトフォント
+        warning_font = FontRegistry.get(None, int(password_ui_font_size / 2))
+        clock_font = FontRegistry.get(None, int(clock_font_size * 1.2)) # 代替フォントのサイズ調整
 
     # 起動時に発生する可能性のあるイベントを破棄
     pygame.event.clear()
@@ -846,6 +3086,7 @@ def main(settings):
     while running:
         # 現在の時刻を取得
         current_time = pygame.time.get_ticks()
+        frame_start = time.perf_counter() # 描画負荷の自動調整用 (clock.tickの待機時間を除いた処理時間を測る)
 
         # --- イベント処理 ---
         for event in pygame.event.get():
@@ -859,6 +3100,10 @@ def main(settings):
             # 通常のQUITイベント（ウィンドウの閉じるボタン、Alt+F4など）は無視する
             if event.type == pygame.QUIT:
                 continue
+            # フレーム計測が有効なら、F3キーは計測結果の表示切り替えに使う (セーバーは解除しない)
+            if profiler.enabled and event.type == pygame.KEYDOWN and event.key == PROFILER_HUD_KEY:
+                profiler.toggle_hud()
+                continue
 
             # パスワード入力中のキー操作を優先的に処理
             if state == "PASSWORD_PROMPT" and event.type == pygame.KEYDOWN:
@@ -909,155 +3154,75 @@ def main(settings):
                         # パスワードが無効なら、mainループを抜けて監視状態に戻る
                         # exit_reason はデフォルトで "user_exit" なので何もしない
                         running = False # ループを抜ける
+        profiler.mark("events")
+
+        # --- シミュレーション処理 (固定タイムステップ) ---
+        # 描画が遅れたフレームでは複数ステップをまとめて進め、アニメーションの速さを一定に保つ
+        sim_steps = sim_clock.advance()
+        if state == "SAVER_ACTIVE":
+            step = sim_clock.step
+            # 描画負荷の自動調整で減らしている場合は、一部のオブジェクトだけを動かす
+            active_lines = governor.active_count(len(lines)) if lines else None
+            active_streams = governor.select_indices(len(matrix_rain)) if matrix_rain else None
+            for _ in range(sim_steps):
+                if saver_mode == SaverMode.BALLS:
+                    if ball_workers:
+                        # ワーカープロセスで移動と衝突を計算 (前回開始したステップの結果を受け取る)
+                        try:
+                            wall_hits, ball_hits = ball_workers.advance(step)
+                        except threading.BrokenBarrierError:
+                            logging.error("物理演算のワーカープロセスが応答しません。メインプロセスでの計算に切り替えます。")
+                            balls = ball_workers.snapshot()
+                            ball_workers.close()
+                            ball_workers = None
+                            continue
+                        profiler.mark("physics workers")
+                    else:
+                        # 全てのボールを移動し、ボール同士の衝突判定と処理を行う
+                        active_balls = balls.head(governor.active_count(len(balls)))
+                        wall_hits = active_balls.move(step)
+                        profiler.mark("move")
+                        ball_hits = active_balls.collide()
+                        profiler.mark("collide")
+                    if wall_spark_enabled:
+                        # 壁との衝突で花火を生成 (少なめに)
+                        particles.emit(wall_hits, governor.spark_range((5, 10)), particle_color_mode)
+                    particles.emit(ball_hits, governor.spark_range((10, 20)), particle_color_mode)
+                elif saver_mode == SaverMode.LINE_ART:
+                    lines.move(step, active_lines)
+                    profiler.mark("move")
+                elif saver_mode == SaverMode.MATRIX:
+                    matrix_rain.update(step, MATRIX_MUTATION_RATE * governor.mutation_scale, active_streams)
+                    profiler.mark("move")
+
+                # --- パーティクルの更新 (寿命が尽きたものはまとめて取り除かれる) ---
+                particles.update(step)
+                profiler.mark("particles")
 
         # --- 描画処理 ---
-        screen.fill(BLACK) # 毎フレーム画面を黒でクリア
+        # 前フレームの描画を黒で消去 (ダーティ矩形描画が無効なら全画面)。残像効果はセーバー実行中のみ
+        renderer.begin_frame(state == "SAVER_ACTIVE")
+        profiler.mark("clear")
 
         # セーバー実行中のみ各モードの描画を行う
         if state == "SAVER_ACTIVE":
+            alpha = sim_clock.alpha # 直前のステップからの補間係数
             if saver_mode == SaverMode.BALLS:
-                # 全てのボールを移動
-                for ball in balls:
-                    try:
-                        wall_collision_info = ball.move()
-                        if wall_spark_enabled and wall_collision_info:
-                            # 壁との衝突で花火を生成
-                            num_particles = random.randint(5, 10) # 少なめに
-                            cx, cy, p_color = wall_collision_info
-                            for _ in range(num_particles):
-                                particles.append(Particle(cx, cy, p_color, particle_color_mode))
-                    except Exception:
-                        for _ in range(num_particles):
-                            particles.append(Particle(cx, cy, p_color, particle_color_mode))
-
-                # ボール同士の衝突判定と処理
-                for i in range(len(balls)):
-                    for j in range(i + 1, len(balls)):
-                        ball1 = balls[i]
-                        ball2 = balls[j]
-
-                        # 衝突ベクトル
-                        coll_vec_x = ball2.x - ball1.x
-                        coll_vec_y = ball2.y - ball1.y
-                        dist = math.sqrt(coll_vec_x**2 + coll_vec_y**2)
-
-                        # 衝突を検出
-                        if dist < ball1.radius + ball2.radius:
-                            # 衝突したら両方のボールの色をランダムに変更
-                            ball1.color = (random.randrange(50, 256), random.randrange(50, 256), random.randrange(50, 256))
-                            ball2.color = (random.randrange(50, 256), random.randrange(50, 256), random.randrange(50, 256))
-
-                            # --- 花火エフェクト生成 ---
-                            num_particles = random.randint(10, 20)
-                            collision_x = (ball1.x + ball2.x) / 2
-                            collision_y = (ball1.y + ball2.y) / 2
-                            # 衝突した両方のボールの色を混ぜて使う
-                            particle_color = ((ball1.color[0] + ball2.color[0]) // 2,
-                                              (ball1.color[1] + ball2.color[1]) // 2,
-                                              (ball1.color[2] + ball2.color[2]) // 2)
-                            for _ in range(num_particles):
-                                particles.append(Particle(collision_x, collision_y, particle_color, particle_color_mode))
-
-                            # --- リアルな物理演算による反発処理 ---
-                            # ゼロ除算を避ける
-                            if dist == 0: dist = 1
-
-                            # 1. 単位法線ベクトルと単位接線ベクトル
-                            un_x = coll_vec_x / dist
-                            un_y = coll_vec_y / dist
-                            ut_x = -un_y
-                            ut_y = un_x
-
-                            # 2. 速度を法線・接線方向に分解 (ドット積)
-                            v1n = ball1.dx * un_x + ball1.dy * un_y
-                            v1t = ball1.dx * ut_x + ball1.dy * ut_y
-                            v2n = ball2.dx * un_x + ball2.dy * un_y
-                            v2t = ball2.dx * ut_x + ball2.dy * ut_y
-
-                            # 3. 法線方向の新しい速度を計算 (1次元弾性衝突の公式)
-                            m1, m2 = ball1.mass, ball2.mass
-                            v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
-                            v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
-
-                            # 4. 新しい速度ベクトルを計算し、ボールの速度を更新
-                            ball1.dx = (v1n_new * un_x) + (v1t * ut_x)
-                            ball1.dy = (v1n_new * un_y) + (v1t * ut_y)
-                            ball2.dx = (v2n_new * un_x) + (v2t * ut_x)
-                            ball2.dy = (v2n_new * un_y) + (v2t * ut_y)
-
-                            # 5. 重なりの解消 (ボールがめり込むのを防ぐ)
-                            overlap = (ball1.radius + ball2.radius) - dist
-                            if overlap > 0:
-                                total_mass = ball1.mass + ball2.mass
-                                ball1.x -= (overlap * (ball2.mass / total_mass)) * un_x
-                                ball1.y -= (overlap * (ball2.mass / total_mass)) * un_y
-                                ball2.x += (overlap * (ball1.mass / total_mass)) * un_x
-                                ball2.y += (overlap * (ball1.mass / total_mass)) * un_y
-
-                # 全てのボールを描画
-                for ball in balls:
-                    ball.draw(screen)
-            elif saver_mode == SaverMode.SLIDESHOW and image_files:
-                # --- フェード開始トリガー ---
-                if not is_fading and current_time - last_image_change_time > slideshow_interval_ms:
-                    is_fading = True
-                    fade_start_time = current_time
-                    # 次の画像を読み込み準備
-                    next_image_index = (current_image_index + 1) % len(image_files)
-                    next_image_surface = load_and_scale_image(image_files[next_image_index], SCREEN_WIDTH, SCREEN_HEIGHT)
-                    
-                    # 画像読み込み失敗時はフェードを中止し、タイマーをリセットして再試行を待つ
-                    if not next_image_surface:
-                        is_fading = False
-                        last_image_change_time = current_time
-
-                # --- 描画とフェード処理 ---
-                if is_fading:
-                    fade_progress = (current_time - fade_start_time) / FADE_DURATION
-                    
-                    # フェードアウトする現在の画像を描画 (存在する場合)
-                    if current_image_surface:
-                        alpha_out = 255 * (1.0 - min(1.0, fade_progress))
-                        current_image_surface.set_alpha(alpha_out)
-                        rect = current_image_surface.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-                        screen.blit(current_image_surface, rect)
-
-                    # フェードインする次の画像を描画 (存在する場合)
-                    if next_image_surface:
-                        alpha_in = 255 * min(1.0, fade_progress)
-                        next_image_surface.set_alpha(alpha_in)
-                        rect = next_image_surface.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-                        screen.blit(next_image_surface, rect)
-
-                    # フェード完了時の状態更新
-                    if fade_progress >= 1.0:
-                        is_fading = False
-                        current_image_surface = next_image_surface
-                        next_image_surface = None
-                        current_image_index = (current_image_index + 1) % len(image_files)
-                        last_image_change_time = current_time
-                else:
-                    # フェード中でない場合、現在の画像を不透明で描画
-                    if current_image_surface:
-                        current_image_surface.set_alpha(255)
-                        rect = current_image_surface.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-                        screen.blit(current_image_surface, rect)
+                # 全てのボールを描画 (並列計算中はダブルバッファの表側を読む)
+                active_balls = ball_workers.balls if ball_workers else balls.head(governor.active_count(len(balls)))
+                renderer.add(active_balls.draw(screen, circle_sprites, alpha, renderer.enabled))
+                del active_balls # 共有メモリ上のビューを残さない (ワーカー終了時に共有メモリを閉じるため)
+            elif saver_mode == SaverMode.SLIDESHOW:
+                renderer.add(slideshow.draw(screen, current_time))
             elif saver_mode == SaverMode.LINE_ART:
-                for line in lines:
-                    line.move()
-                    line.draw(screen)
+                renderer.add(lines.draw(screen, alpha, active_lines, renderer.enabled))
             elif saver_mode == SaverMode.MATRIX:
-                for stream in matrix_streams:
-                    stream.update()
-                    stream.draw(screen)
-
-            # --- パーティクルの更新と描画 ---
-            # スライスコピー `[:]` を使ってループ中にリストから要素を安全に削除
-            for p in particles[:]:
-                p.move()
-                p.draw(screen)
-                if p.lifespan <= 0:
-                    particles.remove(p)
+                renderer.add(matrix_rain.draw(screen, active_streams, renderer.enabled))
+            profiler.mark("draw")
+
+            # --- パーティクルの描画 ---
+            renderer.add(particles.draw(screen, circle_sprites, renderer.enabled))
+            profiler.mark("draw particles")
 
         # パスワード入力画面のUIを描画
         if state == "PASSWORD_PROMPT":
@@ -1076,18 +3241,18 @@ def main(settings):
                 box_y = (SCREEN_HEIGHT - box_height) / 2
 
             # ボックスの描画
-            pygame.draw.rect(screen, (30, 30, 30), (box_x, box_y, box_width, box_height))
+            renderer.add(pygame.draw.rect(screen, (30, 30, 30), (box_x, box_y, box_width, box_height)))
             pygame.draw.rect(screen, (200, 200, 200), (box_x, box_y, box_width, box_height), 2)
 
             # プロンプトテキスト
             prompt_surface = prompt_font.render("パスワードを入力:", True, password_ui_prompt_color)
             prompt_rect = prompt_surface.get_rect(topleft=(box_x + 25, box_y + 20))
-            screen.blit(prompt_surface, prompt_rect)
+            renderer.add(screen.blit(prompt_surface, prompt_rect))
 
             # 入力中のパスワード（アスタリスクで表示）
             input_surface = prompt_font.render("*" * len(input_text), True, password_ui_input_color)
             input_rect = input_surface.get_rect(midleft=(box_x + 25, box_y + 105))
-            screen.blit(input_surface, input_rect)
+            renderer.add(screen.blit(input_surface, input_rect))
 
             # 状況に応じたメッセージを表示
             if password_attempts > 0:
@@ -1100,7 +3265,7 @@ def main(settings):
                 msg_color = password_ui_info_color
             msg_surface = warning_font.render(msg_text, True, msg_color)
             msg_rect = msg_surface.get_rect(bottomleft=(box_x + 25, box_y + box_height - 20))
-            screen.blit(msg_surface, msg_rect)
+            renderer.add(screen.blit(msg_surface, msg_rect))
 
         # --- 時刻の描画 ---
         # セーバーがアクティブ、またはパスワード入力中の場合に時刻を表示
@@ -1122,7 +3287,9 @@ def main(settings):
             rect_kwargs = position_map.get(clock_position, position_map["bottomright"])
 
             time_rect = time_surface.get_rect(**rect_kwargs)
-            screen.blit(time_surface, time_rect)
+            renderer.add(screen.blit(time_surface, time_rect))
+
+        profiler.mark("overlay")
 
         # --- バッテリー残量の描画 ---
         # Windowsかつpsutilが利用可能で、セーバーがアクティブまたはパスワード入力中の場合に表示
@@ -1146,14 +3313,32 @@ def main(settings):
                 battery_rect = battery_surface.get_rect(bottomleft=(padding_x, SCREEN_HEIGHT - padding_y))
                 if clock_enabled and clock_position == "bottomleft":
                     battery_rect.bottom = time_rect.top - 5 # 時刻表示が左下なら、その少し上に表示
-                screen.blit(battery_surface, battery_rect)
+                renderer.add(screen.blit(battery_surface, battery_rect))
 
-        # 画面を更新
-        pygame.display.flip()
+        profiler.mark("battery")
 
-        # フレームレートを60fpsに制限
-        clock.tick(60)
+        # --- フレーム計測結果の描画 (F3キーで表示を切り替え) ---
+        renderer.add(profiler.draw(screen))
+
+        # 画面を更新 (ダーティ矩形描画が有効なら変化した領域だけを転送)
+        renderer.present()
+        profiler.mark("present")
 
+        # 処理時間が目標を超え続けていれば、火花やオブジェクトを減らす (余裕ができれば戻す)
+        if governor.record(time.perf_counter() - frame_start):
+            particles.set_limit(PARTICLE_POOL_CAPACITY * governor.particle_scale)
+
+        # 描画のフレームレートを60fpsに制限 (物理演算の速さはsim_clockで決まる)
+        clock.tick(60)
+        profiler.mark("idle")
+        profiler.end_frame()
+
+    if ball_workers:
+        ball_workers.close()
+    slideshow.close()
+    circle_sprites.log_stats("円スプライトキャッシュ")
+    if surface_cache:
+        surface_cache.log_stats("スライドショーのメモリキャッシュ")
     logging.info("スクリーンセーバーを終了し、待機/監視モードに戻ります。")
     pygame.mouse.set_visible(True) # 監視ループに戻る前にマウスカーソルを表示
 
@@ -1244,6 +3429,12 @@ def open_settings_gui():
     current_timeout_ms = settings.get(CfgKey.IDLE_TIMEOUT, IDLE_TIMEOUT)
     current_ball_count = settings.get(CfgKey.BALL_COUNT, DEFAULT_BALL_COUNT)
     current_max_velocity = settings.get(CfgKey.MAX_VELOCITY, DEFAULT_MAX_VELOCITY)
+    current_physics_substeps = settings.get(CfgKey.PHYSICS_SUBSTEPS, DEFAULT_PHYSICS_SUBSTEPS)
+    current_dirty_rect_enabled = settings.get(CfgKey.DIRTY_RECT_ENABLED, DEFAULT_DIRTY_RECT_ENABLED)
+    current_afterglow_enabled = settings.get(CfgKey.AFTERGLOW_ENABLED, DEFAULT_AFTERGLOW_ENABLED)
+    current_ball_workers = settings.get(CfgKey.BALL_WORKERS, DEFAULT_BALL_WORKERS)
+    current_frame_profiler_enabled = settings.get(CfgKey.FRAME_PROFILER_ENABLED, DEFAULT_FRAME_PROFILER_ENABLED)
+    current_quality_governor_enabled = settings.get(CfgKey.QUALITY_GOVERNOR_ENABLED, DEFAULT_QUALITY_GOVERNOR_ENABLED)
     current_password_enabled = settings.get(CfgKey.PASSWORD_ENABLED, False)
     current_password_hash = settings.get(CfgKey.PASSWORD_HASH)
     current_password_ui_position = settings.get(CfgKey.PASSWORD_UI_POSITION, DEFAULT_PASSWORD_UI_POSITION)
@@ -1256,8 +3447,13 @@ def open_settings_gui():
     current_saver_mode = settings.get(CfgKey.SAVER_MODE, DEFAULT_SAVER_MODE)
     current_slideshow_folder = settings.get(CfgKey.SLIDESHOW_FOLDER, DEFAULT_SLIDESHOW_FOLDER)
     current_slideshow_interval = settings.get(CfgKey.SLIDESHOW_INTERVAL, DEFAULT_SLIDESHOW_INTERVAL)
+    current_slideshow_cache_mb = settings.get(CfgKey.SLIDESHOW_CACHE_MB, DEFAULT_SLIDESHOW_CACHE_MB)
+    current_slideshow_recursive = settings.get(CfgKey.SLIDESHOW_RECURSIVE, DEFAULT_SLIDESHOW_RECURSIVE)
+    current_slideshow_memory_cache_mb = settings.get(CfgKey.SLIDESHOW_MEMORY_CACHE_MB, DEFAULT_SLIDESHOW_MEMORY_CACHE_MB)
+    current_slideshow_ken_burns = settings.get(CfgKey.SLIDESHOW_KEN_BURNS, DEFAULT_SLIDESHOW_KEN_BURNS)
     current_line_count = settings.get(CfgKey.LINE_COUNT, DEFAULT_LINE_COUNT)
     current_line_speed = settings.get(CfgKey.LINE_SPEED, DEFAULT_LINE_SPEED)
+    current_line_trail_length = settings.get(CfgKey.LINE_TRAIL_LENGTH, DEFAULT_LINE_TRAIL_LENGTH)
     current_matrix_font_size = settings.get(CfgKey.MATRIX_FONT_SIZE, DEFAULT_MATRIX_FONT_SIZE)
     current_matrix_speed = settings.get(CfgKey.MATRIX_SPEED, DEFAULT_MATRIX_SPEED)
     current_matrix_font = settings.get(CfgKey.MATRIX_FONT, DEFAULT_MATRIX_FONT)
@@ -1378,6 +3574,12 @@ def open_settings_gui():
     max_velocity_entry.grid(column=1, row=1, sticky=tk.W, pady=5, padx=5)
     ttk.Label(ball_props_frame, text="（2以上の整数）").grid(column=2, row=1, sticky=tk.W, pady=5, padx=5)
 
+    ttk.Label(ball_props_frame, text="物理演算の分割数:").grid(column=0, row=2, sticky=tk.W, pady=5, padx=5)
+    physics_substeps_var = tk.StringVar(value=str(current_physics_substeps))
+    physics_substeps_entry = ttk.Entry(ball_props_frame, width=10, textvariable=physics_substeps_var)
+    physics_substeps_entry.grid(column=1, row=2, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(ball_props_frame, text="（1フレームあたり。大きいほどすり抜けにくい）").grid(column=2, row=2, sticky=tk.W, pady=5, padx=5)
+
     # 花火エフェクトの設定
     fireworks_frame = ttk.LabelFrame(ball_tab, text="花火エフェクト", padding="10")
     fireworks_frame.pack(fill="x", expand=False)
@@ -1413,6 +3615,24 @@ def open_settings_gui():
     interval_entry = ttk.Entry(slideshow_settings_frame, width=10, textvariable=slideshow_interval_var)
     interval_entry.grid(column=1, row=1, sticky=tk.W, pady=5, padx=5)
 
+    ttk.Label(slideshow_settings_frame, text="縮小画像キャッシュの上限（MB）:").grid(column=0, row=2, sticky=tk.W, pady=5, padx=5)
+    slideshow_cache_mb_var = tk.StringVar(value=str(current_slideshow_cache_mb))
+    cache_mb_entry = ttk.Entry(slideshow_settings_frame, width=10, textvariable=slideshow_cache_mb_var)
+    cache_mb_entry.grid(column=1, row=2, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(slideshow_settings_frame, text="（0でキャッシュしない）").grid(column=2, row=2, sticky=tk.W, pady=5, padx=5)
+
+    ttk.Label(slideshow_settings_frame, text="メモリキャッシュの上限（MB）:").grid(column=0, row=3, sticky=tk.W, pady=5, padx=5)
+    slideshow_memory_cache_mb_var = tk.StringVar(value=str(current_slideshow_memory_cache_mb))
+    memory_cache_mb_entry = ttk.Entry(slideshow_settings_frame, width=10, textvariable=slideshow_memory_cache_mb_var)
+    memory_cache_mb_entry.grid(column=1, row=3, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(slideshow_settings_frame, text="（表示済みの画像を残す量。4Kでは1枚約33MB）").grid(column=2, row=3, sticky=tk.W, pady=5, padx=5)
+
+    slideshow_recursive_var = tk.BooleanVar(value=current_slideshow_recursive)
+    ttk.Checkbutton(slideshow_settings_frame, text="サブフォルダ内の画像も表示する", variable=slideshow_recursive_var).grid(column=0, row=4, columnspan=3, sticky=tk.W, pady=5, padx=5)
+
+    slideshow_ken_burns_var = tk.BooleanVar(value=current_slideshow_ken_burns)
+    ttk.Checkbutton(slideshow_settings_frame, text="パン＆ズーム（ケン・バーンズ効果）で表示する", variable=slideshow_ken_burns_var).grid(column=0, row=5, columnspan=3, sticky=tk.W, pady=5, padx=5)
+
     # --- タブ4: ラインアート設定 (レイアウト改善) ---
     line_art_tab = ttk.Frame(notebook, padding="10")
     notebook.add(line_art_tab, text="ラインアート")
@@ -1430,6 +3650,11 @@ def open_settings_gui():
     line_speed_entry = ttk.Entry(line_art_settings_frame, width=10, textvariable=line_speed_var)
     line_speed_entry.grid(column=1, row=1, sticky=tk.W, pady=5, padx=5)
 
+    ttk.Label(line_art_settings_frame, text="残像の長さ (0で無効):").grid(column=0, row=2, sticky=tk.W, pady=5, padx=5)
+    line_trail_length_var = tk.StringVar(value=str(current_line_trail_length))
+    line_trail_length_entry = ttk.Entry(line_art_settings_frame, width=10, textvariable=line_trail_length_var)
+    line_trail_length_entry.grid(column=1, row=2, sticky=tk.W, pady=5, padx=5)
+
     # --- タブ5: マトリックス設定 (レイアウト改善) ---
     matrix_tab = ttk.Frame(notebook, padding="10")
     notebook.add(matrix_tab, text="マトリックス")
@@ -1535,6 +3760,32 @@ def open_settings_gui():
     delete_button = ttk.Button(camera_settings_frame, text="今すぐキャプチャを全削除...", command=force_delete_captures)
     delete_button.grid(column=0, row=4, columnspan=3, sticky=tk.W, pady=(10, 0), padx=5)
 
+    # --- タブ7: パフォーマンス設定 ---
+    performance_tab = ttk.Frame(notebook, padding="10")
+    notebook.add(performance_tab, text="パフォーマンス")
+    rendering_frame = ttk.LabelFrame(performance_tab, text="描画設定", padding="10")
+    rendering_frame.pack(fill="x", expand=False)
+    dirty_rect_enabled_var = tk.BooleanVar(value=current_dirty_rect_enabled)
+    ttk.Checkbutton(rendering_frame, text="変化した領域だけを画面に転送する (ダーティ矩形描画)", variable=dirty_rect_enabled_var).grid(column=0, row=0, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(rendering_frame, text="(大画面で描画する物が少ない場合に効果的です)").grid(column=0, row=1, sticky=tk.W, pady=(0, 5), padx=25)
+    quality_governor_enabled_var = tk.BooleanVar(value=current_quality_governor_enabled)
+    ttk.Checkbutton(rendering_frame, text="処理が間に合わない場合は火花やオブジェクトの数を自動で減らす", variable=quality_governor_enabled_var).grid(column=0, row=2, sticky=tk.W, pady=5, padx=5)
+    afterglow_enabled_var = tk.BooleanVar(value=current_afterglow_enabled)
+    ttk.Checkbutton(rendering_frame, text="前のフレームを薄く残して残像を付ける (アフターグロー)", variable=afterglow_enabled_var).grid(column=0, row=3, sticky=tk.W, pady=5, padx=5)
+
+    parallel_frame = ttk.LabelFrame(performance_tab, text="並列処理", padding="10")
+    parallel_frame.pack(fill="x", expand=False, pady=(10, 0))
+    ttk.Label(parallel_frame, text="ボールの物理演算プロセス数:").grid(column=0, row=0, sticky=tk.W, pady=5, padx=5)
+    ball_workers_var = tk.StringVar(value=str(current_ball_workers))
+    ttk.Entry(parallel_frame, width=10, textvariable=ball_workers_var).grid(column=1, row=0, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(parallel_frame, text=f"(0で無効。ボールが非常に多い場合に有効。CPUコア数: {os.cpu_count()})").grid(column=0, row=1, columnspan=2, sticky=tk.W, pady=(0, 5), padx=5)
+
+    diagnostics_frame = ttk.LabelFrame(performance_tab, text="診断", padding="10")
+    diagnostics_frame.pack(fill="x", expand=False, pady=(10, 0))
+    frame_profiler_enabled_var = tk.BooleanVar(value=current_frame_profiler_enabled)
+    ttk.Checkbutton(diagnostics_frame, text="フレームの処理時間を計測してログに出力する", variable=frame_profiler_enabled_var).grid(column=0, row=0, sticky=tk.W, pady=5, padx=5)
+    ttk.Label(diagnostics_frame, text="(セーバー実行中にF3キーで計測結果を画面に表示)").grid(column=0, row=1, sticky=tk.W, pady=(0, 5), padx=25)
+
     def toggle_camera_settings_state_and_tab():
         """カメラ設定UIの有効/無効を切り替える"""
         state = "normal" if camera_enabled_var.get() and cv2 else "disabled"
@@ -1549,24 +3800,25 @@ def open_settings_gui():
 
     def reset_preview_objects():
         """プレビュー用のオブジェクトを初期化/再初期化する"""
-        nonlocal preview_balls, preview_lines, preview_slideshow_surface, preview_particles, preview_matrix_streams
+        nonlocal preview_balls, preview_lines, preview_slideshow_surface, preview_matrix_rain, preview_sim_clock
         preview_particles.clear()
-        preview_matrix_streams.clear()
 
         # ボールモード用
         max_vel = int(max_velocity_var.get()) if max_velocity_var.get().isdigit() and int(max_velocity_var.get()) >= 2 else 2
-        preview_balls = [Ball(max_velocity=max_vel, screen_width=PREVIEW_WIDTH, screen_height=PREVIEW_HEIGHT) for _ in range(PREVIEW_BALL_COUNT)]
+        substeps = int(physics_substeps_var.get()) if physics_substeps_var.get().isdigit() else DEFAULT_PHYSICS_SUBSTEPS
+        preview_sim_clock = SimulationClock(physics_substeps_for(substeps, max_vel))
+        preview_balls = BallSystem(PREVIEW_BALL_COUNT, max_velocity=max_vel, screen_width=PREVIEW_WIDTH, screen_height=PREVIEW_HEIGHT)
 
         # ラインアートモード用
         max_speed = int(line_speed_var.get()) if line_speed_var.get().isdigit() and int(line_speed_var.get()) > 0 else 2
-        preview_lines = [Line(max_speed=max_speed, screen_width=PREVIEW_WIDTH, screen_height=PREVIEW_HEIGHT) for _ in range(PREVIEW_LINE_COUNT)]
+        trail_length = int(line_trail_length_var.get()) if line_trail_length_var.get().isdigit() else 0
+        preview_lines = LineArtSystem(PREVIEW_LINE_COUNT, max_speed, PREVIEW_WIDTH, PREVIEW_HEIGHT, min(trail_length, MAX_LINE_TRAIL_LENGTH))
 
         # マトリックスモード用
         font_size = int(matrix_font_size_var.get()) if matrix_font_size_var.get().isdigit() and int(matrix_font_size_var.get()) > 0 else 10
         speed = int(matrix_speed_var.get()) if matrix_speed_var.get().isdigit() and int(matrix_speed_var.get()) > 0 else 3
         font_name = matrix_font_var.get()
-        stream_count = PREVIEW_WIDTH // font_size
-        preview_matrix_streams = [MatrixStream(i * font_size, font_size, speed, PREVIEW_HEIGHT, font_name) for i in range(stream_count)]
+        preview_matrix_rain = MatrixRain(PREVIEW_WIDTH, PREVIEW_HEIGHT, font_size, speed, font_name)
 
         # スライドショーモード用 (静的なグラデーションで代用)
         preview_slideshow_surface.fill(BLACK)
@@ -1639,11 +3891,14 @@ def open_settings_gui():
     preview_screen = pygame.display.set_mode((PREVIEW_WIDTH, PREVIEW_HEIGHT))
 
     # プレビュー用オブジェクト
-    preview_balls = []
-    preview_lines = []
-    preview_particles = []
-    preview_matrix_streams = []
+    preview_balls = None
+    preview_lines = None
+    preview_particles = ParticlePool(PREVIEW_PARTICLE_CAPACITY)
+    preview_sprites = CircleSpriteCache()
+    preview_afterglow = AfterglowFader()
+    preview_matrix_rain = None
     preview_slideshow_surface = pygame.Surface((PREVIEW_WIDTH, PREVIEW_HEIGHT))
+    preview_sim_clock = SimulationClock()
 
     # --- 初期状態の設定 (プレビューオブジェクト作成後) ---
     toggle_settings_state() # モードタブの有効/無効を設定
@@ -1730,16 +3985,22 @@ def open_settings_gui():
         # ボール
         ball_count_var.set(str(DEFAULT_BALL_COUNT))
         max_velocity_var.set(str(DEFAULT_MAX_VELOCITY))
+        physics_substeps_var.set(str(DEFAULT_PHYSICS_SUBSTEPS))
         wall_spark_enabled_var.set(True)
         particle_color_mode_var.set(DEFAULT_PARTICLE_COLOR_MODE)
 
         # スライドショー
         slideshow_folder_var.set(DEFAULT_SLIDESHOW_FOLDER)
         slideshow_interval_var.set(str(DEFAULT_SLIDESHOW_INTERVAL))
+        slideshow_cache_mb_var.set(str(DEFAULT_SLIDESHOW_CACHE_MB))
+        slideshow_recursive_var.set(DEFAULT_SLIDESHOW_RECURSIVE)
+        slideshow_ken_burns_var.set(DEFAULT_SLIDESHOW_KEN_BURNS)
+        slideshow_memory_cache_mb_var.set(str(DEFAULT_SLIDESHOW_MEMORY_CACHE_MB))
 
         # ラインアート
         line_count_var.set(str(DEFAULT_LINE_COUNT))
         line_speed_var.set(str(DEFAULT_LINE_SPEED))
+        line_trail_length_var.set(str(DEFAULT_LINE_TRAIL_LENGTH))
 
         # マトリックス
         matrix_font_size_var.set(str(DEFAULT_MATRIX_FONT_SIZE))
@@ -1778,6 +4039,13 @@ def open_settings_gui():
         camera_retention_days_var.set(str(DEFAULT_CAMERA_CAPTURE_RETENTION_DAYS))
         auto_restart_var.set(DEFAULT_AUTO_RESTART_ON_IDLE)
         gui_theme_var.set(DEFAULT_GUI_THEME)
+
+        # パフォーマンス
+        dirty_rect_enabled_var.set(DEFAULT_DIRTY_RECT_ENABLED)
+        afterglow_enabled_var.set(DEFAULT_AFTERGLOW_ENABLED)
+        ball_workers_var.set(str(DEFAULT_BALL_WORKERS))
+        frame_profiler_enabled_var.set(DEFAULT_FRAME_PROFILER_ENABLED)
+        quality_governor_enabled_var.set(DEFAULT_QUALITY_GOVERNOR_ENABLED)
         toggle_password_widgets()
 
         # UIの状態とプレビューを更新
@@ -1800,9 +4068,14 @@ def open_settings_gui():
                 new_max_velocity = int(max_velocity_var.get())
                 if new_max_velocity < 2:
                     raise ValueError("ボールの最大速度は2以上の整数を入力してください。")
+
+                new_physics_substeps = int(physics_substeps_var.get())
+                if new_physics_substeps <= 0:
+                    raise ValueError("物理演算の分割数は1以上の整数を入力してください。")
             else:
                 new_ball_count = current_ball_count # デフォルト値を維持
                 new_max_velocity = current_max_velocity
+                new_physics_substeps = current_physics_substeps
 
             if new_saver_mode == SaverMode.SLIDESHOW:
                 new_slideshow_folder = slideshow_folder_var.get()
@@ -1811,9 +4084,17 @@ def open_settings_gui():
                 new_slideshow_interval = int(slideshow_interval_var.get())
                 if new_slideshow_interval <= 0:
                     raise ValueError("切り替え間隔は1以上の整数を入力してください。")
+                new_slideshow_cache_mb = int(slideshow_cache_mb_var.get())
+                if new_slideshow_cache_mb < 0:
+                    raise ValueError("キャッシュの上限は0以上の整数を入力してください。")
+                new_slideshow_memory_cache_mb = int(slideshow_memory_cache_mb_var.get())
+                if new_slideshow_memory_cache_mb < 0:
+                    raise ValueError("メモリキャッシュの上限は0以上の整数を入力してください。")
             else:
                 new_slideshow_folder = current_slideshow_folder
                 new_slideshow_interval = current_slideshow_interval
+                new_slideshow_cache_mb = current_slideshow_cache_mb
+                new_slideshow_memory_cache_mb = current_slideshow_memory_cache_mb
 
             if new_saver_mode == SaverMode.LINE_ART:
                 new_line_count = int(line_count_var.get())
@@ -1822,9 +4103,13 @@ def open_settings_gui():
                 new_line_speed = int(line_speed_var.get())
                 if new_line_speed <= 0:
                     raise ValueError("線の最大速度は1以上の整数を入力してください。")
+                new_line_trail_length = int(line_trail_length_var.get())
+                if not 0 <= new_line_trail_length <= MAX_LINE_TRAIL_LENGTH:
+                    raise ValueError(f"残像の長さは0から{MAX_LINE_TRAIL_LENGTH}の整数を入力してください。")
             else:
                 new_line_count = current_line_count
                 new_line_speed = current_line_speed
+                new_line_trail_length = current_line_trail_length
                 
             if new_saver_mode == SaverMode.MATRIX:
                 new_matrix_font_size = int(matrix_font_size_var.get())
@@ -1861,16 +4146,25 @@ def open_settings_gui():
             new_camera_motion_threshold = int(camera_motion_threshold_var.get())
             new_camera_retention_days = int(camera_retention_days_var.get())
 
+            new_ball_workers = int(ball_workers_var.get())
+            if new_ball_workers < 0:
+                raise ValueError("物理演算プロセス数は0以上の整数を入力してください。")
 
             new_settings = {
                 CfgKey.SAVER_MODE: new_saver_mode,
                 CfgKey.IDLE_TIMEOUT: int(new_timeout_sec * 1000),
                 CfgKey.BALL_COUNT: new_ball_count,
                 CfgKey.MAX_VELOCITY: new_max_velocity,
+                CfgKey.PHYSICS_SUBSTEPS: new_physics_substeps,
                 CfgKey.SLIDESHOW_FOLDER: new_slideshow_folder,
                 CfgKey.SLIDESHOW_INTERVAL: new_slideshow_interval,
+                CfgKey.SLIDESHOW_CACHE_MB: new_slideshow_cache_mb,
+                CfgKey.SLIDESHOW_MEMORY_CACHE_MB: new_slideshow_memory_cache_mb,
+                CfgKey.SLIDESHOW_RECURSIVE: slideshow_recursive_var.get(),
+                CfgKey.SLIDESHOW_KEN_BURNS: slideshow_ken_burns_var.get(),
                 CfgKey.LINE_COUNT: new_line_count,
                 CfgKey.LINE_SPEED: new_line_speed,
+                CfgKey.LINE_TRAIL_LENGTH: new_line_trail_length,
                 CfgKey.MATRIX_FONT_SIZE: new_matrix_font_size,
                 CfgKey.MATRIX_SPEED: new_matrix_speed,
                 CfgKey.MATRIX_FONT: new_matrix_font,
@@ -1895,6 +4189,11 @@ def open_settings_gui():
                 CfgKey.CAMERA_CAPTURE_RETENTION_DAYS: new_camera_retention_days,
                 CfgKey.AUTO_RESTART_ON_IDLE: auto_restart_var.get(),
                 CfgKey.GUI_THEME: gui_theme_var.get(),
+                CfgKey.DIRTY_RECT_ENABLED: dirty_rect_enabled_var.get(),
+                CfgKey.AFTERGLOW_ENABLED: afterglow_enabled_var.get(),
+                CfgKey.BALL_WORKERS: new_ball_workers,
+                CfgKey.FRAME_PROFILER_ENABLED: frame_profiler_enabled_var.get(),
+                CfgKey.QUALITY_GOVERNOR_ENABLED: quality_governor_enabled_var.get(),
             }
 
             # 設定を保存
@@ -1937,61 +4236,46 @@ def open_settings_gui():
         nonlocal after_id
 
         selected_mode = saver_mode_var.get()
-        preview_screen.fill(BLACK)
 
+        # 物理演算を固定タイムステップで進める
+        step = preview_sim_clock.step
+        for _ in range(preview_sim_clock.advance()):
+            if selected_mode == SaverMode.BALLS:
+                # ボールを移動
+                wall_hits = preview_balls.move(step)
+                if wall_spark_enabled_var.get():
+                    # 壁との衝突で花火を生成 (プレビュー用にさらに少なめに)
+                    preview_particles.emit(wall_hits, (3, 3), particle_color_mode_var.get())
+
+                # プレビュー用の衝突判定と花火生成 (プレビューは少なめに)
+                preview_particles.emit(preview_balls.collide(), (5, 5), particle_color_mode_var.get())
+            elif selected_mode == SaverMode.LINE_ART:
+                preview_lines.move(step)
+            elif selected_mode == SaverMode.MATRIX:
+                preview_matrix_rain.update(step)
+
+            # パーティクルを更新 (モードに関わらず更新し続けることで、モード切り替え後も残像が消える)
+            preview_particles.update(step)
+
+        if afterglow_enabled_var.get():
+            preview_afterglow.apply(preview_screen)
+        else:
+            preview_screen.fill(BLACK)
+        alpha = preview_sim_clock.alpha
         if selected_mode == SaverMode.BALLS:
-            # ボールを移動
-            for ball in preview_balls:
-                wall_collision_info = ball.move()
-                if wall_spark_enabled_var.get() and wall_collision_info:
-                    # 壁との衝突で花火を生成 (プレビュー用)
-                    num_particles = 3 # さらに少なめに
-                    cx, cy, p_color = wall_collision_info
-                    for _ in range(num_particles):
-                        preview_particles.append(Particle(cx, cy, p_color, particle_color_mode_var.get()))
-            
-            # プレビュー用の衝突判定と花火生成
-            for i in range(len(preview_balls)):
-                for j in range(i + 1, len(preview_balls)):
-                    ball1 = preview_balls[i]
-                    ball2 = preview_balls[j]
-                    dx = ball1.x - ball2.x
-                    dy = ball1.y - ball2.y
-                    dist_sq = dx**2 + dy**2
-                    if dist_sq < (ball1.radius + ball2.radius)**2:
-                        # 簡易的な反発
-                        ball1.dx, ball2.dx = ball2.dx, ball1.dx
-                        ball1.dy, ball2.dy = ball2.dy, ball1.dy
-                        # 花火生成
-                        num_particles = 5 # プレビューは少なめに
-                        cx = (ball1.x + ball2.x) / 2
-                        cy = (ball1.y + ball2.y) / 2
-                        p_color = ball1.color
-                        for _ in range(num_particles):
-                            preview_particles.append(Particle(cx, cy, p_color, particle_color_mode_var.get()))
-
             # ボールを描画
-            for ball in preview_balls:
-                ball.draw(preview_screen)
+            preview_balls.draw(preview_screen, preview_sprites, alpha)
         elif selected_mode == SaverMode.SLIDESHOW:
             # プレビューでは静的な画像を表示
             preview_screen.blit(preview_slideshow_surface, (0, 0))
         elif selected_mode == SaverMode.LINE_ART:
-            for line in preview_lines:
-                line.move()
-                line.draw(preview_screen)
+            preview_lines.draw(preview_screen, alpha)
         elif selected_mode == SaverMode.MATRIX:
-            for stream in preview_matrix_streams:
-                stream.update()
-                stream.draw(preview_screen)
-        
-        # パーティクルを描画 (モードに関わらず描画し続けることで、モード切り替え後も残像が消える)
-        for p in preview_particles[:]:
-            p.move()
-            p.draw(preview_screen)
-            if p.lifespan <= 0:
-                preview_particles.remove(p)
-        
+            preview_matrix_rain.draw(preview_screen)
+
+        # パーティクルを描画
+        preview_particles.draw(preview_screen, preview_sprites)
+
         pygame.display.update()
         after_id = root.after(16, update_preview)  # 約60fpsで更新し、IDを保存
 
@@ -2014,12 +4298,12 @@ def authenticate_with_pygame_ui(settings):
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
     pygame.display.set_caption("パスワード認証")
 
-    try:
-        font = pygame.font.SysFont("meiryo", 40)
-        small_font = pygame.font.SysFont("meiryo", 20)
-    except pygame.error:
-        font = pygame.font.Font(None, 50)
-        small_font = pygame.font.Font(None, 25)
+    if FontRegistry.resolve("meiryo"):
+        font = FontRegistry.get("meiryo", 40)
+        small_font = FontRegistry.get("meiryo", 20)
+    else:
+        font = FontRegistry.get(None, 50)
+        small_font = FontRegistry.get(None, 25)
 
     input_text = ""
     running = True
@@ -2083,7 +4367,237 @@ def authenticate_with_pygame_ui(settings):
     return authenticated
 
 
+# --- ベンチマーク ---
+BENCHMARK_MODES = (SaverMode.BALLS, SaverMode.SLIDESHOW, SaverMode.LINE_ART, SaverMode.MATRIX)
+BENCHMARK_SAMPLE_IMAGE_SIZE = (3000, 2000) # スライドショー用に生成するサンプル画像のサイズ (一般的なデジカメ写真程度)
+BENCHMARK_SAMPLE_IMAGE_COUNT = 4
+
+
+def create_benchmark_images(folder):
+    """スライドショーのベンチマーク用に、ノイズ入りのJPEG画像を生成する"""
+    rng = np.random.default_rng(0)
+    width, height = BENCHMARK_SAMPLE_IMAGE_SIZE
+    for index in range(BENCHMARK_SAMPLE_IMAGE_COUNT):
+        # 圧縮が効きすぎないように、グラデーションにノイズを重ねる
+        gradient = np.linspace(0, 255, width, dtype=np.float64)[np.newaxis, :, np.newaxis]
+        noise = rng.normal(0, 40, size=(height, width, 3))
+        pixels = np.clip(gradient * ((index + 1) / BENCHMARK_SAMPLE_IMAGE_COUNT) + noise, 0, 255).astype(np.uint8)
+        Image.fromarray(pixels).save(os.path.join(folder, f"sample_{index}.jpg"), quality=90)
+
+
+def peak_memory_mb():
+    """プロセスのピークメモリ使用量 (MB) を返す。取得できない環境ではNone"""
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linuxはキロバイト、macOSはバイト単位
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if psutil:
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    return None
+
+
+def summarize_times(times):
+    """計測時間 (秒) の配列を、ミリ秒単位の平均と分位点の辞書にまとめる"""
+    ms = np.asarray(times) * 1000
+    summary = {"mean": float(ms.mean())}
+    for percentile in (50, 90, 95, 99):
+        summary[f"p{percentile}"] = float(np.percentile(ms, percentile))
+    summary["max"] = float(ms.max())
+    return summary
+
+
+def benchmark_mode(mode, options):
+    """
+    1つのセーバーモードを、ウィンドウを表示せずに options.frames フレーム分実行して計測する。
+    1フレームは基準フレーム (1/REFERENCE_FPS 秒) とみなし、main() と同じ手順で物理演算と描画を行う。
+    """
+    if options.trace_memory:
+        tracemalloc.start()
+    width, height = options.width, options.height
+    screen = pygame.display.set_mode((width, height))
+    renderer = DirtyRectRenderer(screen, options.dirty_rect, options.afterglow)
+    circle_sprites = CircleSpriteCache()
+    particles = ParticlePool(PARTICLE_POOL_CAPACITY)
+    sim_clock = SimulationClock(physics_substeps_for(options.substeps, options.max_velocity))
+    steps_per_frame = round(1.0 / sim_clock.step)
+    frame_ms = 1000 / REFERENCE_FPS
+
+    balls = ball_workers = slideshow = surface_cache = None
+    lines = None
+    matrix_rain = None
+    if mode == SaverMode.BALLS:
+        object_count = options.count or DEFAULT_BALL_COUNT
+        balls = BallSystem(object_count, max_velocity=options.max_velocity, screen_width=width, screen_height=height)
+        if options.workers > 0:
+            ball_workers = BallWorkerPool(balls, options.workers)
+    elif mode == SaverMode.SLIDESHOW:
+        if options.slideshow_memory_cache > 0:
+            surface_cache = SurfaceLRUCache(options.slideshow_memory_cache * 1024 * 1024)
+        slideshow = Slideshow(options.folder, options.slideshow_interval * 1000, width, height, memory_cache=surface_cache, ken_burns=options.ken_burns)
+        # 保存済みのスライドショーの索引を上書きしないよう、ベンチマーク用の索引は一時フォルダに置く
+        slideshow.index.index_file = os.path.join(tempfile.gettempdir(), "screensaver_bench_index.json")
+        slideshow.quarantine.quarantine_file = os.path.join(tempfile.gettempdir(), "screensaver_bench_quarantine.json")
+        slideshow.start(0)
+        object_count = len(slideshow.index)
+    elif mode == SaverMode.LINE_ART:
+        object_count = options.count or DEFAULT_LINE_COUNT
+        lines = LineArtSystem(object_count, DEFAULT_LINE_SPEED, width, height, options.line_trail)
+    else:
+        object_count = width // options.font_size
+        matrix_rain = MatrixRain(width, height, options.font_size, DEFAULT_MATRIX_SPEED, DEFAULT_MATRIX_FONT)
+
+    sim_times = []
+    draw_times = []
+    try:
+        for frame in range(options.warmup + options.frames):
+            current_time = frame * frame_ms # スライドショーの切り替えも仮想的な時刻で進める
+            if slideshow:
+                # 仮想的な時刻は実際より速く進むため、先読みが終わるのを計測の外で待つ (描画時間に読み込みを含めない)
+                slideshow.wait_prefetch()
+
+            # --- シミュレーション ---
+            sim_start = time.perf_counter()
+            step = sim_clock.step
+            for _ in range(steps_per_frame):
+                if mode == SaverMode.BALLS:
+                    if ball_workers:
+                        wall_hits, ball_hits = ball_workers.advance(step)
+                    else:
+                        wall_hits = balls.move(step)
+                        ball_hits = balls.collide()
+                    particles.emit(wall_hits, (5, 10), DEFAULT_PARTICLE_COLOR_MODE)
+                    particles.emit(ball_hits, (10, 20), DEFAULT_PARTICLE_COLOR_MODE)
+                elif mode == SaverMode.LINE_ART:
+                    lines.move(step)
+                elif mode == SaverMode.MATRIX:
+                    matrix_rain.update(step)
+                particles.update(step)
+
+            # --- 描画 ---
+            draw_start = time.perf_counter()
+            renderer.begin_frame()
+            if mode == SaverMode.BALLS:
+                renderer.add((ball_workers.balls if ball_workers else balls).draw(screen, circle_sprites, 1.0, renderer.enabled))
+            elif mode == SaverMode.SLIDESHOW:
+                renderer.add(slideshow.draw(screen, current_time))
+            elif mode == SaverMode.LINE_ART:
+                renderer.add(lines.draw(screen, return_rects=renderer.enabled))
+            else:
+                renderer.add(matrix_rain.draw(screen, return_rects=renderer.enabled))
+            renderer.add(particles.draw(screen, circle_sprites, renderer.enabled))
+            renderer.present()
+            draw_end = time.perf_counter()
+
+            if frame >= options.warmup:
+                sim_times.append(draw_start - sim_start)
+                draw_times.append(draw_end - draw_start)
+    finally:
+        if ball_workers:
+            ball_workers.close()
+        if slideshow:
+            slideshow.close()
+        peak_traced = None
+        if options.trace_memory:
+            peak_traced = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+
+    frame_times = np.asarray(sim_times) + np.asarray(draw_times)
+    return {
+        "mode": mode,
+        "objects": object_count,
+        "frames": options.frames,
+        "fps_mean": float(len(frame_times) / frame_times.sum()),
+        "frame_ms": summarize_times(frame_times),
+        "sim_ms": summarize_times(sim_times),
+        "draw_ms": summarize_times(draw_times),
+        "peak_traced_mb": peak_traced,
+        "sprite_cache": {
+            "hit_rate": circle_sprites.hit_rate,
+            "sprites": len(circle_sprites.sprites),
+        },
+        "surface_cache": {
+            "hit_rate": surface_cache.hit_rate,
+            "resident_mb": surface_cache.resident_bytes / (1024 * 1024),
+        } if surface_cache else None,
+    }
+
+
+def run_benchmark(argv):
+    """
+    コマンドライン引数 /bench 以降を解析し、指定されたセーバーモードのベンチマークを実行する。
+    結果はJSONで標準出力 (または --output のファイル) に書き出す。
+    """
+    parser = argparse.ArgumentParser(prog="screensaver.py /bench", description="ウィンドウを表示せずに各セーバーモードの描画性能を計測します。")
+    parser.add_argument("--modes", nargs="+", choices=BENCHMARK_MODES, default=list(BENCHMARK_MODES), help="計測するモード (既定: すべて)")
+    parser.add_argument("--width", type=int, default=1920, help="画面の幅")
+    parser.add_argument("--height", type=int, default=1080, help="画面の高さ")
+    parser.add_argument("--count", type=int, default=None, help="ボール/線の数 (既定: 各モードのデフォルト値)")
+    parser.add_argument("--frames", type=int, default=600, help="計測するフレーム数")
+    parser.add_argument("--warmup", type=int, default=60, help="計測前に捨てるフレーム数")
+    parser.add_argument("--max-velocity", type=int, default=DEFAULT_MAX_VELOCITY, help="ボールの最大速度")
+    parser.add_argument("--substeps", type=int, default=DEFAULT_PHYSICS_SUBSTEPS, help="物理演算の分割数")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BALL_WORKERS, help="ボールの物理演算プロセス数")
+    parser.add_argument("--dirty-rect", action="store_true", help="ダーティ矩形描画を有効にする")
+    parser.add_argument("--afterglow", action="store_true", help="残像効果 (アフターグロー) を有効にする")
+    parser.add_argument("--line-trail", type=int, default=DEFAULT_LINE_TRAIL_LENGTH, help="ラインアートの残像の長さ")
+    parser.add_argument("--font-size", type=int, default=DEFAULT_MATRIX_FONT_SIZE, help="マトリックスモードのフォントサイズ")
+    parser.add_argument("--folder", default=None, help="スライドショーの画像フォルダ (既定: サンプル画像を生成)")
+    parser.add_argument("--slideshow-interval", type=int, default=1, help="スライドショーの切り替え間隔 (秒)")
+    parser.add_argument("--ken-burns", action="store_true", help="スライドショーをパン＆ズームで表示する")
+    parser.add_argument("--slideshow-memory-cache", type=int, default=DEFAULT_SLIDESHOW_MEMORY_CACHE_MB, help="スライドショーのメモリキャッシュの上限 (MB)。0で無効")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemallocでPython側のピークメモリも計測する (計測時間が遅くなる)")
+    parser.add_argument("--output", default=None, help="結果のJSONを書き出すファイル")
+    options = parser.parse_args(argv)
+
+    # 保存済みのフォントキャッシュを上書きしないよう、ベンチマーク用のフォントキャッシュは一時フォルダに置く
+    global FONT_CACHE_FILE
+    FONT_CACHE_FILE = os.path.join(tempfile.gettempdir(), "screensaver_bench_font_cache.json")
+
+    # 実際のディスプレイを使わずに描画する
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+
+    with tempfile.TemporaryDirectory() as sample_folder:
+        if SaverMode.SLIDESHOW in options.modes and not options.folder:
+            create_benchmark_images(sample_folder)
+            options.folder = sample_folder
+        results = [benchmark_mode(mode, options) for mode in options.modes]
+
+    report = {
+        "environment": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(str(part) for part in pygame.get_sdl_version()),
+            "numpy": np.__version__,
+            "video_driver": pygame.display.get_driver(),
+            "cpu_count": os.cpu_count(),
+        },
+        "options": {key: value for key, value in vars(options).items() if key != "output"},
+        "results": results,
+        # ピークRSSはプロセス全体で減ることがないため、モードごとではなく実行全体の値として記録する
+        "max_rss_mb": peak_memory_mb(),
+    }
+    report_json = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+    pygame.quit()
+    FontRegistry.clear()
+    return 0
+
+
 if __name__ == '__main__':
+    # PyInstallerでexe化した場合に、物理演算のワーカープロセスが設定GUIを起動しないようにする
+    multiprocessing.freeze_support()
+
+    # コマンドライン引数 /bench が指定された場合は、ベンチマークだけを実行して終了する
+    if len(sys.argv) > 1 and sys.argv[1].lower() == '/bench':
+        sys.exit(run_benchmark(sys.argv[2:]))
+
     # --- 必須ライブラリのインポートチェック ---
     # ... (ライブラリチェックのコードは変更なし) ...
 